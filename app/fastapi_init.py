@@ -1,18 +1,27 @@
-import dataclasses
+import asyncio
 import os
 from contextlib import asynccontextmanager
 
-import multiprocess as mp
 from fastapi import FastAPI
 
 from app.handlers.routers import routers_list
 from app.http_clients import SavingClient, SocDemoClient, UrbanClient
-from app.logic import TerritoriesService
+from app.http_clients.common import ResponseCache
+from app.logic import ResultStore, TerritoriesService
 from app.middlewares import (
     ExceptionHandlerMiddleware,
     LoggingMiddleware,
 )
-from app.utils import PopulationRestoratorApiConfig, configure_logging, start_redis_queue, start_rq_worker
+from app.utils import (
+    FastJSONResponse,
+    JobEventsHub,
+    JobScheduler,
+    JobsCollector,
+    PopulationRestoratorApiConfig,
+    WorkerSupervisor,
+    configure_logging,
+    start_redis_queues,
+)
 
 
 def get_app(prefix: str = "/api") -> FastAPI:
@@ -25,6 +34,7 @@ def get_app(prefix: str = "/api") -> FastAPI:
         contact={"name": "Banakh Andrei", "email": "uuetsukeu@mail.ru"},
         license_info={"name": "MIT"},
         lifespan=lifespan,
+        default_response_class=FastJSONResponse,
     )
     app_config = PopulationRestoratorApiConfig.from_file_or_default(os.getenv("CONFIG_PATH"))
     app.state.config = app_config
@@ -51,24 +61,50 @@ async def lifespan(app: FastAPI):
     """
     app_config = app.state.config
 
+    app.state.response_cache = ResponseCache(
+        host=app_config.redis_queue.host, port=app_config.redis_queue.port, db=app_config.redis_queue.db
+    )
+
     app.state.territories_service = TerritoriesService(
-        urban_client=UrbanClient(app_config.urban_api),
-        socdemo_client=SocDemoClient(app_config.socdemo_api),
+        urban_client=UrbanClient(app_config.urban_api, cache=app.state.response_cache),
+        socdemo_client=SocDemoClient(app_config.socdemo_api, cache=app.state.response_cache),
         saving_client=SavingClient(app_config.saving_api),
         debug=app_config.app.debug,
         population_restorator_config=app_config.population_restorator,
+        result_store=ResultStore(
+            app_config.population_restorator.results,
+            redis_host=app_config.redis_queue.host,
+            redis_port=app_config.redis_queue.port,
+            redis_db=app_config.redis_queue.db,
+        ),
     )
 
-    # todo add manage amount of workers
-    host, port, db, queue_name = dataclasses.astuple(app_config.redis_queue)
-    app.state.redis, app.state.queue = start_redis_queue(host=host, port=port, db=db)
+    redis_config = app_config.redis_queue
+    app.state.redis, queues = start_redis_queues(
+        host=redis_config.host, port=redis_config.port, db=redis_config.db, queue_names=redis_config.queue_names
+    )
+    app.state.scheduler = JobScheduler(app.state.redis, queues, redis_config)
+    app.state.jobs_collector = JobsCollector(app.state.scheduler)
+    app.state.job_events = JobEventsHub(host=redis_config.host, port=redis_config.port, db=redis_config.db)
+    await app.state.job_events.start()
+
+    # workers could also be run standalone by launch_population-restorator-api-worker, then workers: 0
+    supervisor = WorkerSupervisor(redis_config)
+    supervisor.start()
+
+    async def supervise():
+        while True:
+            await asyncio.sleep(redis_config.check_interval)
+            supervisor.check()
 
-    rq_worker_process = mp.Process(target=start_rq_worker, args=(host, port, db, queue_name))
-    rq_worker_process.start()
+    supervise_task = asyncio.create_task(supervise())
 
     yield
 
-    rq_worker_process.terminate()
+    supervise_task.cancel()
+    await asyncio.to_thread(supervisor.stop)
+    await app.state.job_events.close()
+    await app.state.territories_service.close()
 
 
 app = get_app()
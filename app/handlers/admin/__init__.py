@@ -0,0 +1,7 @@
+"""
+All FastApi admin handlers&routers are exported from this module.
+"""
+
+from .cache import invalidate_cache, invalidate_territory_cache
+from .queues import get_queues_stats
+from .routers import admin_routers_list
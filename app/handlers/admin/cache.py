@@ -0,0 +1,53 @@
+"""
+Response cache invalidation handlers are defined here
+"""
+
+import asyncio
+
+from fastapi import HTTPException, Request, status
+from redis import RedisError
+
+from app.schemas import CacheInvalidatedResponse, ErrorResponse
+
+from .routers import admin_router
+
+
+async def _invalidate(invalidate, *args) -> int:
+    """Runs blocking redis SCAN/DEL calls of the cache outside of the event loop"""
+
+    try:
+        return await asyncio.to_thread(invalidate, *args)
+    except RedisError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Response cache is unavailable: {exc}"
+        ) from exc
+
+
+@admin_router.delete(
+    "/admin/cache/territories/{territory_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=CacheInvalidatedResponse,
+    responses={
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        503: {"model": ErrorResponse, "description": "Response cache is unavailable"},
+    },
+)
+async def invalidate_territory_cache(request: Request, territory_id: int):
+    """Deletes all cached Urban API & SocDemo API responses requested for given territory"""
+    deleted = await _invalidate(request.app.state.response_cache.invalidate_territory, territory_id)
+    return CacheInvalidatedResponse(deleted=deleted)
+
+
+@admin_router.delete(
+    "/admin/cache",
+    status_code=status.HTTP_200_OK,
+    response_model=CacheInvalidatedResponse,
+    responses={
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        503: {"model": ErrorResponse, "description": "Response cache is unavailable"},
+    },
+)
+async def invalidate_cache(request: Request):
+    """Deletes all cached Urban API & SocDemo API responses"""
+    deleted = await _invalidate(request.app.state.response_cache.invalidate_all)
+    return CacheInvalidatedResponse(deleted=deleted)
@@ -0,0 +1,24 @@
+"""
+Job queues statistics handlers are defined here
+"""
+
+from dataclasses import asdict
+
+from fastapi import Request, status
+
+from app.schemas import ErrorResponse, QueueStatsResponse
+
+from .routers import admin_router
+
+
+@admin_router.get(
+    "/admin/queues",
+    status_code=status.HTTP_200_OK,
+    response_model=list[QueueStatsResponse],
+    responses={
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+)
+async def get_queues_stats(request: Request):
+    """Returns depth and wait times of every job queue from the highest priority to the lowest one"""
+    return [QueueStatsResponse(**asdict(stats)) for stats in request.app.state.scheduler.stats()]
@@ -0,0 +1,15 @@
+"""
+Api admin routers are defined here.
+It is needed to import files which use these routers to initialize handlers.
+"""
+
+from fastapi import APIRouter
+
+
+admin_router = APIRouter(tags=["admin"])
+
+admin_routers_list = [
+    admin_router,
+]
+
+all = ["admin_routers_list"]
@@ -0,0 +1,20 @@
+"""
+Prometheus metrics handler is defined here
+"""
+
+import asyncio
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.utils.metrics import render_metrics
+
+from .routers import system_router
+
+
+@system_router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Returns metrics of api and rq workers processes, queues and workers in prometheus text format"""
+
+    output = await asyncio.to_thread(render_metrics, request.app.state.jobs_collector)
+    return Response(output, media_type=CONTENT_TYPE_LATEST)
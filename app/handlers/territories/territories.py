@@ -4,30 +4,48 @@ FastApi territory & population related handlers are defined here
 
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Callable
 from datetime import date, datetime, timezone
 from typing import Literal, Union
 
 from fastapi import HTTPException, Query, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
+from rq.job import Job, JobStatus
 
 from app.http_clients.common.exceptions import (
     APIConnectionError,
     APIError,
     APITimeoutError,
+    CircuitOpenError,
     InvalidStatusCode,
     ObjectNotFoundError,
 )
 from app.schemas import (
+    BatchJobCreatedResponse,
+    BatchRestoreRequest,
     ErrorResponse,
     GatewayErrorResponse,
     JobCreatedResponse,
     JobErrorResponse,
     JobNotFoundErrorResponse,
     JobResponse,
+    ServiceUnavailableResponse,
+    TerritoryJobsResponse,
     TerritoryResponse,
     TimeoutErrorResponse,
 )
-from app.utils import JobError
+from app.utils import (
+    TERMINAL_JOB_EVENTS,
+    DependencyFailedError,
+    FastJSONResponse,
+    JobError,
+    JobProgress,
+    fetch_job,
+    is_job_active,
+    job_key,
+)
+from app.utils.serialization import dumps
 
 from .routers import territories_router
 
@@ -36,11 +54,21 @@ FOREIGN_API_EXCEPTIONS = [
     APIError,
     APIConnectionError,
     APITimeoutError,
+    CircuitOpenError,
     ObjectNotFoundError,
     InvalidStatusCode,
 ]
 
 
+def enqueue_job(request: Request, job_type: str, key: str, func: Callable, *args, **kwargs) -> tuple[Job, bool]:
+    """Enqueues job by the app JobScheduler, unknown priority class is a bad request"""
+
+    try:
+        return request.app.state.scheduler.enqueue(job_type, key, func, *args, **kwargs)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
 @territories_router.post(
     "/territories/balance/{territory_id}",
     status_code=status.HTTP_201_CREATED,
@@ -53,20 +81,28 @@ async def balance(
     request: Request,
     territory_id: int,
     start_date: date = Query(None, description="earliest date information about to be searched for"),
+    priority: str = Query(None, description="priority class of the job, interactive or bulk by default"),
+    force: bool = Query(False, description="enqueue the job even if identical one is queued or running"),
 ):
     # todo desc
 
     territories_service = request.app.state.territories_service
 
-    job = request.app.state.queue.enqueue(
+    job, enqueued = enqueue_job(
+        request,
+        "balance",
+        job_key("balance", territory_id=territory_id, start_date=start_date),
         territories_service.balance,
         args=(
             territory_id,
             start_date,
         ),
         job_timeout=9000,
+        territory_id=territory_id,
+        priority=priority,
+        force=force,
     )
-    return JobCreatedResponse(job_id=job.id, status="Queued")
+    return JobCreatedResponse(job_id=job.id, status="Queued", coalesced=not enqueued)
 
 
 @territories_router.post(
@@ -84,6 +120,8 @@ async def divide(
     territory_id: int,
     start_date: date = Query(None, description="earliest date information about to be searched for"),  # NO TOGETHER
     from_previous: str = Query(None, description="id of balance job which calculations would be used"),
+    priority: str = Query(None, description="priority class of the job, interactive or bulk by default"),
+    force: bool = Query(False, description="enqueue the job even if identical one is queued or running"),
 ):
     # todo desc
 
@@ -94,24 +132,40 @@ async def divide(
         )
 
     territories_service = request.app.state.territories_service
+    key = job_key("divide", territory_id=territory_id, start_date=start_date, from_previous=from_previous)
+    schedule = {"territory_id": territory_id, "priority": priority, "force": force}
 
-    prev_job = request.app.state.queue.fetch_job(from_previous) if from_previous else None
+    prev_job = fetch_job(request.app.state.redis, from_previous) if from_previous else None
     if from_previous is None:
-        job = request.app.state.queue.enqueue(
-            territories_service.divide, territory_id, start_date=start_date, job_timeout=9000
+        job, enqueued = enqueue_job(
+            request,
+            "divide",
+            key,
+            territories_service.divide,
+            territory_id,
+            start_date=start_date,
+            job_timeout=9000,
+            **schedule,
         )
     elif prev_job and prev_job.is_finished:
-        job = request.app.state.queue.enqueue(
-            territories_service.divide, territory_id, houses_df=prev_job.return_value()[1]
+        job, enqueued = enqueue_job(
+            request,
+            "divide",
+            key,
+            territories_service.divide,
+            territory_id,
+            balanced=prev_job.return_value(),
+            job_timeout=9000,
+            **schedule,
         )
     elif prev_job and not prev_job.is_finished:
         raise HTTPException(status_code=424, detail=f"Previous job {from_previous} is not finished yet.")
     else:
-        return JSONResponse(
+        return FastJSONResponse(
             JobNotFoundErrorResponse(detail="previous job {from_previous} not found").model_dump(), status_code=404
         )
 
-    return JobCreatedResponse(job_id=job.id, status="Queued")
+    return JobCreatedResponse(job_id=job.id, status="Queued", coalesced=not enqueued)
 
 
 @territories_router.post(
@@ -128,22 +182,119 @@ async def restore(
     year_begin: int = Query(...),
     year_end: int = Query(...),
     scenario: Literal["NEGATIVE", "NEUTRAL", "POSITIVE"] = "NEUTRAL",
-    from_scratch: bool = Query(True, description="recalculate previous steps before restoring"),
+    from_scratch: bool = Query(
+        True,
+        description="recalculate previous steps before restoring,"
+        " otherwise already uploaded years of the same forecast are kept and only missing years are forecasted",
+    ),
+    scenarios: list[Literal["NEGATIVE", "NEUTRAL", "POSITIVE"]] = Query(
+        None, description="forecast all given scenarios in one job from one divide, scenario is ignored then"
+    ),
+    priority: str = Query(None, description="priority class of the job, interactive or bulk by default"),
+    force: bool = Query(False, description="enqueue the job even if identical one is queued or running"),
 ):
     # todo desc
     territories_service = request.app.state.territories_service
 
+    if scenarios:
+        # identical submissions get the same key whatever the scenarios order is,
+        # scenario is ignored by the job then, so it is fixed too
+        scenarios = sorted(set(scenarios))
+        scenario = scenarios[0]
+        if len(scenarios) == 1:
+            scenarios = None
+
     restore_args = {
         "territory_id": territory_id,
         "year_begin": year_begin,
         "years": year_end - year_begin,
         "scenario": scenario,
         "from_scratch": from_scratch,
+        "scenarios": scenarios,
     }
 
-    job = request.app.state.queue.enqueue(territories_service.restore, kwargs=restore_args, job_timeout=9000)
+    job, enqueued = enqueue_job(
+        request,
+        "restore",
+        job_key("restore", **restore_args),
+        territories_service.restore,
+        kwargs=restore_args,
+        job_timeout=9000,
+        territory_id=territory_id,
+        priority=priority,
+        force=force,
+    )
+
+    return JobCreatedResponse(job_id=job.id, status="Queued", coalesced=not enqueued)
+
+
+@territories_router.post(
+    "/territories/batch/restore",
+    status_code=status.HTTP_201_CREATED,
+    response_model=BatchJobCreatedResponse,
+    responses={
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+)
+async def batch_restore(request: Request, batch: BatchRestoreRequest):
+    """
+    Enqueues one job graph for all given territories and scenarios:
+    territory is divided once for year_begin and its scenarios are restored from the published divided db
+    by independent jobs depending on the divide one, so they run in parallel on free workers.
+    If the divide job fails, its restore jobs fail with DependencyFailedError without being run
+    """
+    if batch.year_end <= batch.year_begin:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="year_end should be after year_begin")
+
+    territories_service = request.app.state.territories_service
+    scenarios = list(dict.fromkeys(batch.scenarios))
+
+    territories_jobs = []
+    for territory_id in dict.fromkeys(batch.territories_ids):
+        # jobs get the same keys as the ones of divide and restore endpoints, so identical ones are coalesced
+        start_date = date(batch.year_begin, 1, 1)
+        divide_job, _ = enqueue_job(
+            request,
+            "divide",
+            job_key("divide", territory_id=territory_id, start_date=start_date, from_previous=None),
+            territories_service.divide,
+            territory_id,
+            start_date=start_date,
+            job_timeout=9000,
+            territory_id=territory_id,
+            priority=batch.priority,
+            force=batch.force,
+        )
+        restore_jobs_ids = {}
+        for scenario in scenarios:
+            restore_args = {
+                "territory_id": territory_id,
+                "year_begin": batch.year_begin,
+                "years": batch.year_end - batch.year_begin,
+                "scenario": scenario,
+                "from_scratch": False,
+                "scenarios": None,
+            }
+            restore_job, _ = enqueue_job(
+                request,
+                "restore",
+                job_key("restore", **restore_args),
+                territories_service.restore,
+                kwargs=restore_args,
+                requires=[divide_job],
+                job_timeout=9000,
+                territory_id=territory_id,
+                priority=batch.priority,
+                force=batch.force,
+            )
+            restore_jobs_ids[scenario] = restore_job.id
+        territories_jobs.append(
+            TerritoryJobsResponse(
+                territory_id=territory_id, divide_job_id=divide_job.id, restore_jobs_ids=restore_jobs_ids
+            )
+        )
 
-    return JobCreatedResponse(job_id=job.id, status="Queued")
+    return BatchJobCreatedResponse(status="Queued", territories=territories_jobs)
 
 
 @territories_router.get(
@@ -154,22 +305,25 @@ async def restore(
         404: {"description": "Job not found", "model": JobNotFoundErrorResponse},
         500: {"description": "Internal Server Error", "model": ErrorResponse},
         502: {"description": "Bad Gateway", "model": Union[JobErrorResponse, GatewayErrorResponse]},
+        503: {"description": "Upstream server is considered down", "model": ServiceUnavailableResponse},
         504: {"description": "Didn't receive a timely response from upstream server", "model": TimeoutErrorResponse},
     },
 )
 async def get_status(request: Request, job_id: str):
-    job = request.app.state.queue.fetch_job(job_id)
+    job = fetch_job(request.app.state.redis, job_id)
 
     if job is None:
-        return JSONResponse(
+        return FastJSONResponse(
             content=JobNotFoundErrorResponse(detail="No job with such id").model_dump(), status_code=404
         )
 
+    progress = job.meta.get(JobProgress.meta_key)
     if job.is_finished:
         return JobResponse(
             job_id=job.id,
             status=job.get_status(),
-            result=TerritoryResponse(performed_at=str(datetime.now(timezone.utc))),
+            result=TerritoryResponse(performed_at=str(job.ended_at or datetime.now(timezone.utc))),
+            progress=progress,
         )
 
     if job.is_failed:
@@ -181,4 +335,87 @@ async def get_status(request: Request, job_id: str):
 
         raise JobError(job.id, exc_type, exc_value, job.exc_info)
 
-    return JobResponse(job_id=job.id, status=job.get_status(), result=job.result)
+    return JobResponse(job_id=job.id, status=job.get_status(), result=None, progress=progress)
+
+
+def job_state_event(job: Job) -> dict:
+    """Returns: job event of the current job state, see app.utils.job_events"""
+
+    job_status = JobStatus(job.get_status())
+    event = {"job_id": job.id, "status": job_status.value, "progress": job.meta.get(JobProgress.meta_key)}
+    if job_status == JobStatus.DEFERRED and not is_job_active(job):
+        return event | {
+            "event": "failed",
+            "error": "Job dependencies have failed or were canceled, it is never run",
+            "error_type": DependencyFailedError.__name__,
+        }
+    if job_status == JobStatus.FINISHED:
+        return event | {"event": "finished", "performed_at": str(job.ended_at or datetime.now(timezone.utc))}
+    if job_status in (JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED):
+        exc_type = job.meta.get("exc_type", {}).get("exc_type")
+        exc_value = job.meta.get("exc_value", {}).get("exc_value")
+        return event | {
+            "event": "failed",
+            "error": str(exc_value) if exc_value is not None else None,
+            "error_type": exc_type.__name__ if exc_type is not None else job_status.value,
+        }
+    return event | {"event": "progress"}
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {dumps(event).decode('utf-8')}\n\n"
+
+
+@territories_router.get(
+    "/territories/status/{job_id}/events",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "Stream of job events"},
+        404: {"description": "Job not found", "model": JobNotFoundErrorResponse},
+    },
+)
+async def stream_status(
+    request: Request,
+    job_id: str,
+    keepalive: float = Query(15.0, gt=0, le=60, description="seconds between keepalive comments"),
+):
+    """
+    Streams job events as server-sent events: current job state first, then progress events published by the
+    worker and the final "finished" or "failed" one, the stream is closed after it.
+    Events are dispatched from one redis subscription of the api process, the job itself is only checked
+    when nothing is received for `keepalive` seconds
+    """
+    redis_conn = request.app.state.redis
+    if fetch_job(redis_conn, job_id) is None:
+        return FastJSONResponse(
+            content=JobNotFoundErrorResponse(detail="No job with such id").model_dump(), status_code=404
+        )
+
+    async def events():
+        # subscribed before the job state is read, so no event between them is missed
+        async with request.app.state.job_events.subscribe(job_id) as queue:
+            job = fetch_job(redis_conn, job_id)
+            if job is None:
+                return
+            event = job_state_event(job)
+            yield format_sse(event)
+            while event["event"] not in TERMINAL_JOB_EVENTS:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    # events could be missed while redis subscription was being restored
+                    job = fetch_job(redis_conn, job_id)
+                    if job is None:
+                        return
+                    event = job_state_event(job)
+                    if event["event"] not in TERMINAL_JOB_EVENTS:
+                        continue
+                yield format_sse(event)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
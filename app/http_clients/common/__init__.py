@@ -3,12 +3,21 @@ Base http_client, request sending method and http exceptions
 are defined here
 """
 
+from .adaptive import AIMDController
+from .cache import (
+    ResponseCache,
+    cached,
+)
+from .circuit_breaker import CircuitBreaker
 from .exceptions import (
     APIConnectionError,
     APIError,
     APITimeoutError,
+    CircuitOpenError,
+    InvalidStatusCode,
     ObjectNotFoundError,
     handle_exceptions,
+    is_upstream_failure,
 )
 from .http_client import (
     BaseClient,
@@ -17,4 +26,5 @@ from .requests import (
     handle_delete_request,
     handle_get_request,
     handle_post_request,
+    iter_get_request_items,
 )
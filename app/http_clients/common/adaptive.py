@@ -0,0 +1,42 @@
+"""AIMD controller of bulk upload chunk size and concurrency is defined here"""
+
+from __future__ import annotations
+
+from app.utils import BulkRequestsConfig
+
+
+class AIMDController:
+    """
+    Tunes requests in flight and rows per request of bulk uploads in the style of AIMD:
+    every chunk answered faster than `target_latency` adds about one request in flight per round of requests
+    and `upload_chunk_step` rows to the chunk, slower chunks shrink the chunk size,
+    429/5xx responses and connection errors cut both by `decrease_factor`.
+    Values stay within [min_upload_*, max_upload_*] of the config, upload_* ones are the starting point
+    """
+
+    def __init__(self, config: BulkRequestsConfig):
+        self.config = config
+        self.concurrency = float(
+            min(max(config.upload_concurrency, config.min_upload_concurrency), config.max_upload_concurrency)
+        )
+        self.chunk_size = min(max(config.upload_chunk_size, config.min_upload_chunk_size), config.max_upload_chunk_size)
+
+    @property
+    def limit(self) -> int:
+        """Returns: number of requests allowed in flight"""
+        return int(self.concurrency)
+
+    def on_success(self, latency: float) -> None:
+        if not self.config.adaptive:
+            return
+        if latency <= self.config.target_latency:
+            self.concurrency = min(self.concurrency + 1 / self.concurrency, self.config.max_upload_concurrency)
+            self.chunk_size = min(self.chunk_size + self.config.upload_chunk_step, self.config.max_upload_chunk_size)
+        else:
+            self.chunk_size = max(int(self.chunk_size * self.config.decrease_factor), self.config.min_upload_chunk_size)
+
+    def on_overload(self) -> None:
+        if not self.config.adaptive:
+            return
+        self.concurrency = max(self.concurrency * self.config.decrease_factor, self.config.min_upload_concurrency)
+        self.chunk_size = max(int(self.chunk_size * self.config.decrease_factor), self.config.min_upload_chunk_size)
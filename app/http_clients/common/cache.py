@@ -0,0 +1,138 @@
+"""Redis-backed cache of API clients responses is defined here"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import pickle
+import zlib
+from collections.abc import Iterable
+from functools import wraps
+from typing import Any, Callable
+
+import structlog
+from redis import Redis, RedisError
+
+
+logger = structlog.getLogger()
+
+
+class ResponseCache:
+    """
+    Stores compressed pickled results of client methods in redis with a ttl
+
+    Every entry key is also added to the index set of territories it was requested for,
+    so all cached data about some territory could be invalidated at once
+    """
+
+    prefix = "population-restorator-api:cache"
+    index_ttl = 7 * 24 * 60 * 60
+
+    def __init__(self, host: str, port: int, db: int):
+        self.host = host
+        self.port = port
+        self.db = db
+        self._redis: Redis | None = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_redis"] = None
+        return state
+
+    @property
+    def redis(self) -> Redis:
+        if self._redis is None:
+            self._redis = Redis(host=self.host, port=self.port, db=self.db)
+        return self._redis
+
+    def make_key(self, client: str, method: str, arguments: dict[str, Any]) -> str:
+        arguments_hash = hashlib.sha1(repr(sorted(arguments.items())).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{client}:{method}:{arguments_hash}"
+
+    def _territory_index_key(self, territory_id: int) -> str:
+        return f"{self.prefix}:territory:{territory_id}"
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """Returns (True, value) on cache hit and (False, None) on miss"""
+
+        try:
+            payload = self.redis.get(key)
+        except RedisError as exc:
+            logger.warning(f"response cache is unavailable, key: {key}, error: {exc}")
+            return False, None
+        if payload is None:
+            return False, None
+        return True, pickle.loads(zlib.decompress(payload))
+
+    def set(self, key: str, value: Any, ttl: int, territories_ids: Iterable[int]) -> None:
+        payload = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), level=3)
+        try:
+            pipeline = self.redis.pipeline()
+            pipeline.set(key, payload, ex=ttl)
+            for territory_id in territories_ids:
+                index_key = self._territory_index_key(territory_id)
+                pipeline.sadd(index_key, key)
+                pipeline.expire(index_key, max(ttl, self.index_ttl))
+            pipeline.execute()
+        except RedisError as exc:
+            logger.warning(f"response cache is unavailable, key: {key}, error: {exc}")
+
+    def invalidate_territory(self, territory_id: int) -> int:
+        """Deletes all cached responses requested for given territory, returns amount of deleted entries"""
+
+        index_key = self._territory_index_key(territory_id)
+        keys = self.redis.smembers(index_key)
+        deleted = self.redis.delete(*keys) if keys else 0
+        self.redis.delete(index_key)
+        logger.info(f"invalidated response cache for territory {territory_id}, deleted entries: {deleted}")
+        return deleted
+
+    def invalidate_all(self) -> int:
+        """Deletes all cached responses, returns amount of deleted entries"""
+
+        deleted = 0
+        for key in self.redis.scan_iter(match=f"{self.prefix}:*", count=1000):
+            if not key.decode("utf-8").startswith(f"{self.prefix}:territory:"):
+                deleted += 1
+            self.redis.delete(key)
+        logger.info(f"invalidated response cache, deleted entries: {deleted}")
+        return deleted
+
+
+def cached(territory_args: Iterable[str] = ("territory_id",)) -> Callable:
+    """
+    This decorator caches client method results in the client's ResponseCache,
+    key is built from the client, method name and all its arguments,
+    ttl is taken from the client's config `cache_ttl` by method name, methods without ttl are not cached
+
+    Args:
+        territory_args: names of method arguments with territories ids the entry is invalidated by
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def _wrapper(client, *args, **kwargs):
+            ttl = client.config.cache_ttl.get(func.__name__)
+            if client.cache is None or not ttl:
+                return await func(client, *args, **kwargs)
+
+            bound_arguments = signature.bind(client, *args, **kwargs)
+            bound_arguments.apply_defaults()
+            arguments = dict(list(bound_arguments.arguments.items())[1:])
+
+            key = client.cache.make_key(str(client), func.__name__, arguments | {"host": client.config.host})
+            hit, value = client.cache.get(key)
+            if hit:
+                logger.debug(f"response cache hit: {{client: {client}, method: {func.__name__}, args: {arguments}}}")
+                return value
+
+            value = await func(client, *args, **kwargs)
+            territories_ids = [arguments[name] for name in territory_args if arguments.get(name) is not None]
+            client.cache.set(key, value, ttl, territories_ids)
+            return value
+
+        return _wrapper
+
+    return decorator
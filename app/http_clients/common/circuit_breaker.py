@@ -0,0 +1,69 @@
+"""Per-client circuit breaker is defined here"""
+
+from __future__ import annotations
+
+import time
+
+import structlog
+
+from app.utils import CircuitBreakerConfig
+
+
+logger = structlog.getLogger()
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive upstream failures (connection errors, timeouts, 5xx) of one client.
+    After `failure_threshold` of them the circuit opens and calls fail fast for `reset_timeout` seconds,
+    then one trial call is let through: its success (any upstream response) closes the circuit,
+    its failure opens it again
+    """
+
+    def __init__(self, name: str, config: CircuitBreakerConfig):
+        self.name = name
+        self.config = config
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow_call(self) -> bool:
+        if not self.config.enabled or self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.config.reset_timeout or self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def retry_after(self) -> float:
+        """Returns: seconds until the next trial call is let through, whole reset timeout while a trial is running"""
+
+        if self.opened_at is None:
+            return 0.0
+        if self._trial_running:
+            return self.config.reset_timeout
+        return max(self.config.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"{self.name} circuit is closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def release_trial(self) -> None:
+        """Lets the next call through if the trial one ended without a result (cancelled or failed in the client)"""
+
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.config.enabled and (self.opened_at is not None or self.failures >= self.config.failure_threshold):
+            if self.opened_at is None:
+                logger.error(f"{self.name} circuit is open after {self.failures} failures")
+            self.opened_at = time.monotonic()
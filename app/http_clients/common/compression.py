@@ -0,0 +1,47 @@
+"""Request bodies compression is defined here"""
+
+from __future__ import annotations
+
+import gzip
+
+import structlog
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = structlog.getLogger()
+
+_brotli_warned = False
+
+
+def compress_body(body: bytes, encoding: str) -> tuple[bytes, str]:
+    """
+    Args:
+        body: bytes, serialized request body
+        encoding: str, "gzip" or "br", brotli falls back to gzip when `brotli` package is not installed
+    Returns: compressed body and its Content-Encoding
+    """
+
+    global _brotli_warned  # pylint: disable=global-statement
+
+    if encoding == "br":
+        if brotli is not None:
+            return brotli.compress(body, quality=4), "br"
+        if not _brotli_warned:
+            logger.warning("brotli package is not installed, compressing request bodies with gzip")
+            _brotli_warned = True
+    elif encoding != "gzip":
+        raise ValueError(f"Unsupported request body encoding: {encoding}")
+    return gzip.compress(body, compresslevel=5), "gzip"
+
+
+def accept_encoding(config_value: str | None) -> str | None:
+    """Returns: Accept-Encoding header value without brotli if aiohttp couldn't decode it"""
+
+    if config_value is None or brotli is not None:
+        return config_value
+    return ", ".join(coding for coding in (c.strip() for c in config_value.split(",")) if coding != "br") or None
@@ -1,11 +1,28 @@
 """API client base exceptions are defined here."""
 
+from __future__ import annotations
+
 import asyncio
+import random
+from contextvars import ContextVar
 from functools import wraps
-from typing import Callable
+from typing import TYPE_CHECKING, Any, Callable
 
+import structlog
 from aiohttp import ClientConnectionError
 
+from app.utils.metrics import UPSTREAM_RETRIES
+
+
+if TYPE_CHECKING:
+    from .circuit_breaker import CircuitBreaker
+
+
+logger = structlog.getLogger()
+
+# breakers of the client calls running in the current task, nested calls of the same client skip the breaker
+_active_breakers: ContextVar[tuple[CircuitBreaker, ...]] = ContextVar("active_breakers", default=())
+
 
 class APIError(RuntimeError):
     """Generic Urban API error."""
@@ -26,22 +43,100 @@ class ObjectNotFoundError(APIError):
 class InvalidStatusCode(APIError):
     """Got unexpected status code from API request."""
 
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(APIConnectionError):
+    """Upstream has failed too many times in a row, calls fail fast until the circuit is closed."""
 
-def handle_exceptions(func: Callable) -> Callable:
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """
+    Returns: whether the error means upstream is down or overloaded (connection errors, timeouts, 429, 5xx),
+    so the call could be retried, open circuit is not retried
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, InvalidStatusCode):
+        return exc.status is None or exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (APIConnectionError, ClientConnectionError, asyncio.exceptions.TimeoutError, TimeoutError))
+
+
+async def _call(func: Callable, args: tuple, kwargs: dict, retry: bool, breaker: CircuitBreaker | None) -> Any:
+    client = args[0]
+    retry_config = client.config.retry
+    attempts = retry_config.attempts if retry else 1
+    for attempt in range(attempts):
+        trial = breaker is not None and breaker.is_open
+        if breaker is not None and not breaker.allow_call():
+            raise CircuitOpenError(
+                f"{client} circuit is open, upstream is considered down", retry_after=breaker.retry_after()
+            )
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as exc:  # pylint: disable=broad-except
+            if not is_upstream_failure(exc):
+                if breaker is not None and isinstance(exc, (InvalidStatusCode, ObjectNotFoundError)):
+                    # upstream has answered, so it is up
+                    breaker.record_success()
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt == attempts - 1 or (breaker is not None and breaker.is_open):
+                if isinstance(exc, ClientConnectionError):
+                    raise APIConnectionError(f"Error on connection by {client}") from exc
+                if isinstance(exc, asyncio.exceptions.TimeoutError):
+                    raise APITimeoutError(f"Timeout expired on {client} request") from exc
+                raise
+            UPSTREAM_RETRIES.labels(str(client), func.__name__).inc()
+            delay = random.uniform(0, min(retry_config.backoff_max, retry_config.backoff_base * 2**attempt))
+            logger.warning(
+                f"{client} call {func.__name__} failed, attempt {attempt + 1} of {attempts},"
+                f" error: {exc!r}, retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+        finally:
+            if trial:
+                breaker.release_trial()
+    return None
+
+
+def handle_exceptions(func: Callable | None = None, *, retry: bool = True) -> Callable:
     """
     This decorator is used to handle aiohttp exceptions
-    and pass them into the middleware exception handler
+    and pass them into the middleware exception handler.
+
+    Calls go through the client circuit breaker, failed idempotent calls (retry=True)
+    are repeated with jittered exponential backoff by `ApiConfig.retry`,
+    non-idempotent ones or ones made of other retried calls should use `handle_exceptions(retry=False)`
     """
 
-    @wraps(func)
-    async def _wrapper(*args, **kwargs):
-        try:
-            return await func(*args, **kwargs)
-        except ClientConnectionError as exc:
+    def _decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def _wrapper(*args, **kwargs):
             client = args[0]
-            raise APIConnectionError(f"Error on connection by {client}") from exc
-        except asyncio.exceptions.TimeoutError as exc:
-            client = args[0]
-            raise APITimeoutError(f"Timeout expired on {client} request") from exc
-
-    return _wrapper
+            breaker = client.circuit_breaker
+            if breaker in _active_breakers.get():
+                # calls nested in a call of the same client are only retried, the outer one goes through the breaker
+                return await _call(func, args, kwargs, retry, None)
+            token = _active_breakers.set(_active_breakers.get() + (breaker,))
+            try:
+                return await _call(func, args, kwargs, retry, breaker)
+            finally:
+                _active_breakers.reset(token)
+
+        return _wrapper
+
+    if func is not None:
+        return _decorator(func)
+    return _decorator
@@ -3,16 +3,139 @@
 from __future__ import annotations
 
 import abc
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import aiohttp
 
 from app.utils import ApiConfig
 
+from .cache import ResponseCache
+from .circuit_breaker import CircuitBreaker
+from .compression import accept_encoding
+from .requests import handle_delete_request, handle_get_request, handle_post_request, iter_get_request_items
+
 
 class BaseClient(abc.ABC):
-    """Base API client"""
+    """
+    Base API client
+
+    Every client owns one long-lived aiohttp session with keep-alive connections.
+    The session is created lazily on the first request, so it is built inside the rq worker
+    event loop (clients are pickled into jobs without it) and has to be released with `close()`.
+
+    Methods decorated with `cached` store their results in the optional ResponseCache,
+    methods decorated with `handle_exceptions` are retried and go through the client circuit breaker.
+    """
 
-    def __init__(self, api_config: ApiConfig):
+    def __init__(self, api_config: ApiConfig, cache: ResponseCache | None = None):
         self.config: ApiConfig = api_config
+        self.cache: ResponseCache | None = cache
+        self.circuit_breaker = CircuitBreaker(str(self), api_config.circuit_breaker)
+        self._session: aiohttp.ClientSession | None = None
+        self._session_loop: asyncio.AbstractEventLoop | None = None
 
     @abc.abstractmethod
     def __str__(self):
         """"""
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_session"] = None
+        state["_session_loop"] = None
+        return state
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Returns client's pooled session, creating it in the running event loop if needed"""
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            pool_config = self.config.connection_pool
+            connector = aiohttp.TCPConnector(
+                limit=pool_config.limit,
+                limit_per_host=pool_config.limit_per_host,
+                keepalive_timeout=pool_config.keepalive_timeout,
+                ttl_dns_cache=pool_config.dns_cache_ttl,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        """Closes pooled session and its connections"""
+
+        if self._session is not None and not self._session.closed and self._session_loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    def _get_headers(self, headers: dict[str, Any] | None) -> dict[str, Any]:
+        """Returns: headers with Accept-Encoding negotiated by `compression.accept_encoding`"""
+
+        encodings = accept_encoding(self.config.compression.accept_encoding)
+        if encodings is None:
+            return headers or {}
+        return {"Accept-Encoding": encodings} | (headers or {})
+
+    async def get(
+        self,
+        url: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, Any] | None = None,
+    ) -> dict | None:
+        return await handle_get_request(
+            url, params, self._get_headers(headers), session=await self.get_session(), client=str(self)
+        )
+
+    async def post(
+        self,
+        url: str,
+        json: dict,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, Any] | None = None,
+        raise_for_status: bool = True,
+    ) -> dict | None:
+        return await handle_post_request(
+            url,
+            json,
+            params,
+            headers,
+            session=await self.get_session(),
+            raise_for_status=raise_for_status,
+            compression=self.config.compression.request_encoding,
+            compression_min_size=self.config.compression.min_size,
+            client=str(self),
+        )
+
+    async def delete(
+        self,
+        url: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, Any] | None = None,
+        json: dict | None = None,
+        raise_for_status: bool = True,
+    ) -> dict | None:
+        return await handle_delete_request(
+            url,
+            params,
+            headers,
+            session=await self.get_session(),
+            json=json,
+            raise_for_status=raise_for_status,
+            compression=self.config.compression.request_encoding,
+            compression_min_size=self.config.compression.min_size,
+            client=str(self),
+        )
+
+    async def stream_items(
+        self,
+        url: str,
+        prefix: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, Any] | None = None,
+    ) -> AsyncIterator[Any]:
+        async for item in iter_get_request_items(
+            url, prefix, params, self._get_headers(headers), session=await self.get_session(), client=str(self)
+        ):
+            yield item
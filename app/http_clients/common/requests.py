@@ -4,12 +4,20 @@ Sending request method is defined here
 
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+from time import monotonic
 from typing import Any
+from urllib.parse import urlsplit
 
 import aiohttp
+import ijson
 import structlog
 
-from .exceptions import InvalidStatusCode
+from app.utils.metrics import UPSTREAM_BYTES, UPSTREAM_REQUEST_DURATION, UPSTREAM_REQUESTS, endpoint_label
+from app.utils.serialization import dumps, loads
+
+from .compression import compress_body
+from .exceptions import InvalidStatusCode, ObjectNotFoundError
 
 
 async def _handle_request(
@@ -19,22 +27,47 @@ async def _handle_request(
     headers: dict[str, Any] | None = None,
     session: aiohttp.ClientSession | None = None,
     json: dict | None = None,
+    raise_for_status: bool = True,
+    compression: str | None = None,
+    compression_min_size: int = 1024,
+    client: str | None = None,
 ) -> dict | None:
     """
-    handles HTTP requests (GET, POST, DELETE) and returns response
+    handles HTTP requests (GET, POST, DELETE) and returns response,
+    404 and 204 give None, other unexpected status codes are raised as InvalidStatusCode
+    unless `raise_for_status` is unset.
+    json bodies are serialized to bytes by app.utils.serialization,
+    ones of at least `compression_min_size` bytes are sent compressed if `compression` ("gzip"/"br") is set.
+    Duration, status and decoded body sizes are observed in upstream metrics labeled by `client` (url host by default)
     """
     params = params or {}
     headers = headers or {}
     logger = structlog.get_logger()
+    labels = (client or urlsplit(url).netloc, method.upper(), endpoint_label(url))
+
+    data = None
+    if json is not None:
+        data = dumps(json)
+        headers = headers | {"Content-Type": "application/json"}
+        body_size = len(data)
+        if compression is not None and body_size >= compression_min_size:
+            data, content_encoding = compress_body(data, compression)
+            headers["Content-Encoding"] = content_encoding
+        UPSTREAM_BYTES.labels(*labels, "sent", headers.get("Content-Encoding", "identity")).inc(body_size)
 
     new_session = session is None
     if new_session:
         session = aiohttp.ClientSession()
 
+    began = monotonic()
+    status = "error"
+    received: aiohttp.ClientResponse | None = None
     try:
         async with session.request(
-            method=method.upper(), url=url, params=params, json=json, headers=headers
+            method=method.upper(), url=url, params=params, data=data, headers=headers
         ) as response:
+            status = str(response.status)
+            received = response
             logger.info(
                 f"Sent request: {{method: {method}, url: {url}, "
                 f"params: {params}, headers: {headers}, status: {response.status}}}"
@@ -46,12 +79,18 @@ async def _handle_request(
             if response.status == 204:
                 return None
             if response.status >= 200 and response.status < 300:
-                return await response.json()
+                return await response.json(loads=loads)
 
             response_text = await response.text()
             logger.error(f"Error on {method}: {{status: {response.status}, " f"response_text: {response_text}}}")
-            #raise InvalidStatusCode(f"Unexpected status code on {url}: {response.status}")
+            if raise_for_status:
+                raise InvalidStatusCode(f"Unexpected status code on {url}: {response.status}", response.status)
     finally:
+        UPSTREAM_REQUEST_DURATION.labels(*labels).observe(monotonic() - began)
+        UPSTREAM_REQUESTS.labels(*labels, status).inc()
+        if received is not None:
+            encoding = received.headers.get("Content-Encoding", "identity")
+            UPSTREAM_BYTES.labels(*labels, "received", encoding).inc(received.content.total_bytes)
         if new_session and session:
             await session.close()
 
@@ -61,8 +100,9 @@ async def handle_get_request(
     params: dict[str, Any] | None = None,
     headers: dict[str, Any] | None = None,
     session: aiohttp.ClientSession | None = None,
+    client: str | None = None,
 ) -> dict | None:
-    return await _handle_request("GET", url, params, headers, session=session)
+    return await _handle_request("GET", url, params, headers, session=session, client=client)
 
 
 async def handle_post_request(
@@ -71,8 +111,14 @@ async def handle_post_request(
     params: dict[str, Any] | None = None,
     headers: dict[str, Any] | None = None,
     session: aiohttp.ClientSession | None = None,
+    raise_for_status: bool = True,
+    compression: str | None = None,
+    compression_min_size: int = 1024,
+    client: str | None = None,
 ) -> dict | None:
-    return await _handle_request("POST", url, params, headers, session, json)
+    return await _handle_request(
+        "POST", url, params, headers, session, json, raise_for_status, compression, compression_min_size, client
+    )
 
 
 async def handle_delete_request(
@@ -81,5 +127,78 @@ async def handle_delete_request(
     headers: dict[str, Any] | None = None,
     session: aiohttp.ClientSession | None = None,
     json: dict | None = None,
+    raise_for_status: bool = True,
+    compression: str | None = None,
+    compression_min_size: int = 1024,
+    client: str | None = None,
 ) -> dict | None:
-        return await _handle_request("DELETE", url, params, headers, session=session, json=json)
+    return await _handle_request(
+        "DELETE",
+        url,
+        params,
+        headers,
+        session=session,
+        json=json,
+        raise_for_status=raise_for_status,
+        compression=compression,
+        compression_min_size=compression_min_size,
+        client=client,
+    )
+
+
+async def iter_get_request_items(
+    url: str,
+    prefix: str,
+    params: dict[str, Any] | None = None,
+    headers: dict[str, Any] | None = None,
+    session: aiohttp.ClientSession | None = None,
+    client: str | None = None,
+) -> AsyncIterator[Any]:
+    """
+    handles HTTP GET request and incrementally decodes response body,
+    yielding json items under the ijson `prefix` (e.g. "features.item") as they arrive,
+    so the whole response is never held in memory.
+    Duration and received bytes are observed until the body is read
+    """
+    params = params or {}
+    headers = headers or {}
+    logger = structlog.get_logger()
+    labels = (client or urlsplit(url).netloc, "GET", endpoint_label(url))
+
+    new_session = session is None
+    if new_session:
+        session = aiohttp.ClientSession()
+
+    began = monotonic()
+    status = "error"
+    received: aiohttp.ClientResponse | None = None
+    try:
+        async with session.request(method="GET", url=url, params=params, headers=headers) as response:
+            status = str(response.status)
+            received = response
+            logger.info(
+                f"Sent request: {{method: GET, url: {url}, "
+                f"params: {params}, headers: {headers}, status: {response.status}}}"
+            )
+            logger.debug(f"Response headers: {response.headers}")
+
+            if response.status == 404:
+                raise ObjectNotFoundError(f"Got 404 on {url}")
+            if response.status == 204:
+                return
+            if response.status >= 200 and response.status < 300:
+                async for item in ijson.items(response.content, prefix, use_float=True):
+                    yield item
+                return
+
+            response_text = await response.text()
+            logger.error(f"Error on GET: {{status: {response.status}, " f"response_text: {response_text}}}")
+            raise InvalidStatusCode(f"Unexpected status code on {url}: {response.status}", response.status)
+    finally:
+        UPSTREAM_REQUEST_DURATION.labels(*labels).observe(monotonic() - began)
+        UPSTREAM_REQUESTS.labels(*labels, status).inc()
+        if received is not None:
+            encoding = received.headers.get("Content-Encoding", "identity")
+            UPSTREAM_BYTES.labels(*labels, "received", encoding).inc(received.content.total_bytes)
+        if new_session and session:
+            await session.close()
@@ -5,22 +5,25 @@ with information about population, houses & territories
 
 from __future__ import annotations
 
-from asyncio import Semaphore, gather
-from collections.abc import Iterable
+from asyncio import Condition, Semaphore, Task, TimeoutError, create_task, gather, sleep
+from collections import deque
+from time import monotonic
 from typing import Literal
-from math import ceil
 
 import aiohttp
 import structlog
 
 from app.http_clients.common import (
+    AIMDController,
+    APIError,
     BaseClient,
-    handle_delete_request,
+    InvalidStatusCode,
     handle_exceptions,
-    handle_post_request,
+    is_upstream_failure,
 )
-from app.models import UrbanSocialDistribution
-from app.schemas import UrbanSocialDistributionPost
+from app.models import ForecastedDistribution
+from app.utils import job_progress
+from app.utils.metrics import UPSTREAM_RETRIES
 
 
 logger = structlog.getLogger()
@@ -34,67 +37,175 @@ class SavingClient(BaseClient):
             logger.warning("http/https schema is not set, defaulting to http")
             self.config.host = f"http://{self.config.host}"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._upload_controller: AIMDController | None = None
+
     def __str__(self):
         return "SavingClient"
 
-    @handle_exceptions
-    async def post_forecasted_data(self, houses_data: Iterable[UrbanSocialDistribution]):
-        houses_data = [UrbanSocialDistributionPost.from_model(house).dict() for house in houses_data]
-        chunk_size = 1000
-        semaphore_size = 10
-        chunks_count = ceil(len(houses_data) / chunk_size)
-        semaphore = Semaphore(semaphore_size)
+    def _get_upload_controller(self) -> AIMDController:
+        # tuned values are kept between uploads of the job years
+        if self._upload_controller is None:
+            self._upload_controller = AIMDController(self.config.bulk)
+        return self._upload_controller
+
+    # chunks are retried by the uploader itself, create-many is not idempotent as a whole
+    @handle_exceptions(retry=False)
+    async def post_forecasted_data(self, distribution: ForecastedDistribution):
+        """
+        Uploads distribution rows in chunks, chunk size and requests in flight are tuned by AIMDController,
+        chunks rejected with 429/5xx or failed to connect are retried up to `bulk.retries` times
+        """
+        bulk_config = self.config.bulk
+        controller = self._get_upload_controller()
+        rows_count = len(distribution)
 
         url = f"{self.config.host}/api/v1/distribution/create-many"
         headers = {
             "accept": "application/json",
         }
-        session = aiohttp.ClientSession()
 
-        async def send_chunk(chunk_id):
-            start_idx = chunk_id * chunk_size
-            end_idx = min((chunk_id + 1) * chunk_size, len(houses_data))
-            chunk_data = houses_data[start_idx:end_idx]
-            async with semaphore:
-                await handle_post_request(
+        condition = Condition()
+        in_flight = 0
+        offset = 0
+        uploaded = 0
+        retry_chunks: deque[tuple[int, int, int]] = deque()
+        errors: list[Exception] = []
+        tasks: set[Task] = set()
+
+        progress = job_progress()
+        counter = f"upload_rows:{distribution.scenario}"
+        progress.start_counter(counter, total=rows_count, year=distribution.year)
+
+        async def send_chunk(start: int, stop: int, attempt: int):
+            nonlocal in_flight, uploaded
+            began = monotonic()
+            try:
+                # dtos are built from distribution arrays only for chunks being sent
+                await self.post(
                     url=url,
                     headers=headers,
-                    json={"dtos": chunk_data},
-                    session=session
+                    json={"dtos": distribution.dtos(start, stop)},
                 )
-                logger.info(f"Sent {chunk_id} chunk of {chunks_count}")
-
-        tasks = [
-            send_chunk(chunk_id)
-            for chunk_id in range(chunks_count)
-        ]
-
-        await gather(*tasks)
-        await session.close()
-
-    @handle_exceptions
+            except (APIError, aiohttp.ClientError, TimeoutError) as exc:
+                overloaded = not isinstance(exc, InvalidStatusCode) or exc.status == 429 or (exc.status or 0) >= 500
+                if overloaded:
+                    controller.on_overload()
+                if not overloaded or attempt >= bulk_config.retries:
+                    errors.append(exc)
+                else:
+                    UPSTREAM_RETRIES.labels(str(self), "create_many_chunk").inc()
+                    delay = bulk_config.retry_delay * 2**attempt
+                    logger.warning(
+                        f"failed to send chunk of {stop - start} rows, year: {distribution.year}, error: {exc!r},"
+                        f" retrying in {delay}s, chunk size: {controller.chunk_size}, in flight: {controller.limit}"
+                    )
+                    await sleep(delay)
+                    retry_chunks.append((start, stop, attempt + 1))
+            else:
+                controller.on_success(monotonic() - began)
+                uploaded += stop - start
+                progress.advance(counter, stop - start)
+                logger.info(
+                    f"Sent {uploaded} of {rows_count} rows, year: {distribution.year},"
+                    f" chunk size: {controller.chunk_size}, in flight: {controller.limit}"
+                )
+            finally:
+                async with condition:
+                    in_flight -= 1
+                    condition.notify_all()
+
+        with progress.stage("upload"):
+            try:
+                async with condition:
+                    while not errors:
+                        if in_flight < controller.limit and (retry_chunks or offset < rows_count):
+                            if retry_chunks:
+                                start, stop, attempt = retry_chunks.popleft()
+                            else:
+                                start, stop, attempt = offset, min(offset + controller.chunk_size, rows_count), 0
+                                offset = stop
+                            in_flight += 1
+                            task = create_task(send_chunk(start, stop, attempt))
+                            tasks.add(task)
+                            task.add_done_callback(tasks.discard)
+                            continue
+                        if in_flight == 0 and not retry_chunks and offset >= rows_count:
+                            break
+                        await condition.wait()
+            finally:
+                if in_flight > 0:
+                    for task in tasks:
+                        task.cancel()
+                await gather(*tasks, return_exceptions=True)
+
+        if errors:
+            raise errors[0]
+
+    @handle_exceptions(retry=False)
     async def delete_forecasted_data(
         self,
         scenario: Literal["NEGATIVE", "NEUTRAL", "POSITIVE"],
         buildings_ids: dict[int, set[int]],
     ):
+        """
+        Deletes forecasted data of given buildings per year,
+        ids are sent in chunks of `bulk.delete_chunk_size` with at most `bulk.delete_concurrency` requests at once,
+        deleting is idempotent so chunks failed with connection errors, timeouts, 429 or 5xx are retried
+        """
+        bulk_config = self.config.bulk
+        semaphore = Semaphore(bulk_config.delete_concurrency)
 
         base_url = f"{self.config.host}/api/v1/distribution/many"
 
-        params = {
-            "scenario": scenario
-        }
-
-        session = aiohttp.ClientSession()
+        params = {"scenario": scenario}
 
-        tasks = [
-            handle_delete_request(
-                url=base_url,
-                params=params | {"year": year},
-                session=session,
-                json=list(values),
-            )
-            for year, values in buildings_ids.items()
+        chunks = [
+            (year, ids[start : start + bulk_config.delete_chunk_size])
+            for year, values in sorted(buildings_ids.items())
+            for ids in (sorted(values),)
+            for start in range(0, len(ids), bulk_config.delete_chunk_size)
         ]
-        await gather(*tasks)
-        await session.close()
+        chunks_count = len(chunks)
+        deleted_chunks = 0
+
+        progress = job_progress()
+        counter = f"delete_chunks:{scenario}"
+        progress.start_counter(counter, total=chunks_count)
+
+        async def delete_chunk(year: int, chunk: list[int]):
+            nonlocal deleted_chunks
+            async with semaphore:
+                for attempt in range(bulk_config.retries + 1):
+                    try:
+                        await self.delete(
+                            url=base_url,
+                            params=params | {"year": year},
+                            json=chunk,
+                        )
+                        break
+                    except (APIError, aiohttp.ClientError, TimeoutError) as exc:
+                        # rejected chunks (4xx) would be rejected again, only unavailable upstream is waited for
+                        if attempt == bulk_config.retries or not is_upstream_failure(exc):
+                            raise
+                        UPSTREAM_RETRIES.labels(str(self), "delete_many_chunk").inc()
+                        delay = bulk_config.retry_delay * 2**attempt
+                        logger.warning(
+                            f"failed to delete chunk of {len(chunk)} ids, year: {year}, error: {exc!r},"
+                            f" retrying in {delay}s"
+                        )
+                        await sleep(delay)
+            deleted_chunks += 1
+            progress.advance(counter)
+            logger.info(f"Deleted {deleted_chunks} chunk of {chunks_count}, year: {year}, ids: {len(chunk)}")
+
+        with progress.stage("delete"):
+            tasks = [create_task(delete_chunk(year, chunk)) for year, chunk in chunks]
+            try:
+                await gather(*tasks)
+            finally:
+                # the first failed chunk fails the deletion, the other ones are not left running in background
+                for task in tasks:
+                    task.cancel()
+                await gather(*tasks, return_exceptions=True)
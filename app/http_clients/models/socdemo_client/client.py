@@ -12,8 +12,8 @@ import structlog
 from app.http_clients.common import (
     BaseClient,
     ObjectNotFoundError,
+    cached,
     handle_exceptions,
-    handle_get_request,
 )
 from app.models import BirthStats, FertilityInterval, PopulationPyramid, SurvivabilityCoefficients
 from app.utils import PopulationRestoratorApiConfig
@@ -34,6 +34,7 @@ class SocDemoClient(BaseClient):
         return "SocDemoClient"
 
     @handle_exceptions
+    @cached()
     async def get_population_pyramid(
         self, territory_id: int, oktmo_code: int | None = None, year: int | None = None
     ) -> PopulationPyramid:
@@ -62,7 +63,7 @@ class SocDemoClient(BaseClient):
 
         # getting response
         url = f"{self.config.host}/indicators/{indicator_id}/{territory_id}/detailed"
-        data = await handle_get_request(url, params, headers)
+        data = await self.get(url, params, headers)
 
         if data is None:
             raise ObjectNotFoundError(
@@ -111,6 +112,19 @@ class SocDemoClient(BaseClient):
         after_pyramid = await self.get_population_pyramid(territory_id, oktmo_code, year)
         before_pyramid = await self.get_population_pyramid(territory_id, oktmo_code, after_pyramid.year - 1)
 
+        return self.surviability_coeffs_from_pyramids(after_pyramid, before_pyramid)
+
+    @staticmethod
+    def surviability_coeffs_from_pyramids(
+        after_pyramid: PopulationPyramid, before_pyramid: PopulationPyramid
+    ) -> SurvivabilityCoefficients:
+        """
+        Args:
+            after_pyramid: PopulationPyramid, pyramid of the year coefficients are calculated for
+            before_pyramid: PopulationPyramid, pyramid of the previous year
+        Returns: SurvivabilityCoefficients
+        """
+
         if not (
             len(after_pyramid.men)
             == len(after_pyramid.women)
@@ -146,6 +160,20 @@ class SocDemoClient(BaseClient):
 
         population_pyramid = await self.get_population_pyramid(territory_id, oktmo_code, year)
 
+        return self.birth_stats_from_pyramid(population_pyramid, fertility_interval)
+
+    @staticmethod
+    def birth_stats_from_pyramid(
+        population_pyramid: PopulationPyramid, fertility_interval: FertilityInterval
+    ) -> BirthStats:
+        """
+        Args:
+            population_pyramid: PopulationPyramid, pyramid of the year birth stats are calculated for
+            fertility_interval: FertilityInterval, ages of women giving birth
+        Retuns:
+            BirthStats
+        """
+
         births = population_pyramid.men[0] + population_pyramid.women[0]
         fertil_women = sum(population_pyramid.women[fertility_interval.start : fertility_interval.end + 1])
 
@@ -17,11 +17,13 @@ import structlog
 from app.http_clients.common import (
     BaseClient,
     ObjectNotFoundError,
+    cached,
     handle_exceptions,
-    handle_get_request,
 )
 from app.utils import PopulationRestoratorApiConfig
 
+from .parsers import HousesColumns, population_from_features, territories_from_features
+
 
 config = PopulationRestoratorApiConfig.from_file_or_default(os.getenv("CONFIG_PATH"))
 logger = structlog.getLogger()
@@ -39,6 +41,7 @@ class UrbanClient(BaseClient):
         return "UrbanClient"
 
     @handle_exceptions
+    @cached(territory_args=("parent_id",))
     async def get_internal_territories(self, parent_id: int) -> pd.DataFrame:
         """
         Args: parent_id
@@ -68,27 +71,16 @@ class UrbanClient(BaseClient):
             "accept": "application/json",
         }
 
-        data = await handle_get_request(url, params, headers)
+        data = await self.get(url, params, headers)
 
-        internal_territories_df = pd.DataFrame(data)
+        if data is None:
+            raise ObjectNotFoundError()
 
         # formatting
-        columns = ["territory_id", "name", "parent_id", "level", "geometry"]
-        formatted_territories_df = pd.DataFrame(columns=columns)
-        formatted_territories_df.set_index("territory_id", inplace=True)
-
-        for i in internal_territories_df["features"]:
-            formatted_territories_df.loc[i["properties"]["territory_id"]] = {
-                "name": i["properties"]["name"],
-                "parent_id": i["properties"]["parent"]["id"],
-                "level": i["properties"]["level"],
-                "territory_id": i["properties"]["territory_id"],
-                "geometry": i["geometry"],
-            }
-
-        return formatted_territories_df
+        return territories_from_features(data["features"])
 
     @handle_exceptions
+    @cached()
     async def get_oktmo_of_territory_by_urban_db_id(self, territory_id: int) -> int | None:
         """
         Args: territory_id (int)
@@ -104,7 +96,7 @@ class UrbanClient(BaseClient):
             "accept": "application/json",
         }
 
-        data = await handle_get_request(url, params, headers)
+        data = await self.get(url, params, headers)
 
         if data is None:
             raise ObjectNotFoundError()
@@ -114,6 +106,7 @@ class UrbanClient(BaseClient):
             return None
 
     @handle_exceptions
+    @cached()
     async def get_territory(self, territory_id: int) -> pd.DataFrame:
         """
         Args: territory_id
@@ -141,7 +134,7 @@ class UrbanClient(BaseClient):
             "accept": "application/json",
         }
 
-        data = await handle_get_request(url, params, headers)
+        data = await self.get(url, params, headers)
 
         if data is None:
             raise ObjectNotFoundError()
@@ -164,6 +157,7 @@ class UrbanClient(BaseClient):
         return territory_df
 
     @handle_exceptions
+    @cached(territory_args=("parent_id",))
     async def get_population_for_child_territories(self, parent_id: int, last_only: bool = True) -> pd.DataFrame:
         """
         Args: parent_id
@@ -195,28 +189,16 @@ class UrbanClient(BaseClient):
             "accept": "application/json",
         }
 
-        data = await handle_get_request(url, params, headers)
+        data = await self.get(url, params, headers)
 
         if data is None:
             raise ObjectNotFoundError()
 
-        population_df = pd.DataFrame(data)
-
         # formatting
+        return population_from_features(data["features"])
 
-        columns = ["territory_id", "population"]
-        formatted_population_df = pd.DataFrame(columns=columns)
-        formatted_population_df.set_index("territory_id")
-
-        for i in population_df["features"]:
-            formatted_population_df.loc[i["properties"]["territory_id"]] = {
-                "territory_id": i["properties"]["territory_id"],
-                "population": int(i["properties"]["indicators"][0]["value"]),
-            }
-
-        return formatted_population_df
-
-    @handle_exceptions
+    # population of every parent is retried by get_population_for_child_territories itself
+    @handle_exceptions(retry=False)
     async def bind_population_to_territories(self, territories_df: pd.DataFrame) -> pd.DataFrame:
         """
         Args: territories dataframe
@@ -250,6 +232,8 @@ class UrbanClient(BaseClient):
         # merge dfs
         return pd.merge(territories_df, population_df, on="territory_id", how="left")
 
+    @handle_exceptions
+    @cached(territory_args=("territory_parent_id",))
     async def get_houses_from_territories(self, territory_parent_id: int) -> pd.DataFrame:
         """
         Args: parent_id (int)
@@ -281,42 +265,15 @@ class UrbanClient(BaseClient):
             "accept": "application/json",
         }
 
-        data = await handle_get_request(url, params, headers)
-
-        if data is None:
-            raise ObjectNotFoundError()
-
-        internal_houses_df = pd.DataFrame(data)
-
-        # formatting
-        columns = ["house_id", "territory_id", "living_area"]
-        formatted_houses_df = pd.DataFrame(columns=columns)
-        formatted_houses_df.set_index("house_id", drop=False, inplace=True)
-
-        for i in internal_houses_df["features"]:
-            try:
-                living_area_modeled = i["properties"]["building"]["properties"]["living_area_modeled"]
-                living_area_official = i["properties"]["building"]["properties"]["living_area_official"]
-            except KeyError as exc:
-                logger.error(f"house with id {i['properties']['building']['id']} has no living_area property")
-                logger.error(exc, i)
-                continue
-            except TypeError as exc:
-                logger.error(
-                    f"something wrong with house properties territory_parent_id: {territory_parent_id} house_id: {i['properties']['territories'][0]['id']}"
-                )
-                logger.error(exc, i)
-                continue
-            formatted_houses_df.loc[i["properties"]["building"]["id"]] = {
-                "house_id": i["properties"]["building"]["id"],
-                "territory_id": i["properties"]["territories"][0]["id"],
-                # prefering living_area_modeled than living_are_official, if none of this available -> 0
-                "living_area": living_area_modeled if living_area_modeled is not None else (living_area_official or 0),
-            }
+        # decoding response body incrementally, only needed house fields are kept from every feature
+        houses = HousesColumns(territory_parent_id)
+        async for feature in self.stream_items(url, "features.item", params, headers):
+            houses.add(feature)
 
-        return formatted_houses_df
+        return houses.to_dataframe()
 
     @handle_exceptions
+    @cached()
     async def get_population_from_territory(self, territory_id: int, start_date: date | None = None) -> int:
         """
         Args:
@@ -343,7 +300,7 @@ class UrbanClient(BaseClient):
             "accept": "application/json",
         }
 
-        data = await handle_get_request(url, params, headers)
+        data = await self.get(url, params, headers)
 
         if data is None:
             raise ObjectNotFoundError()
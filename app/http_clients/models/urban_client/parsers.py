@@ -0,0 +1,121 @@
+"""
+Urban API GeoJSON features parsing is defined here
+
+Needed fields are pulled from features into column lists in one pass
+and every dataframe is built with a single constructor call
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+import pandas as pd
+import structlog
+
+
+logger = structlog.getLogger()
+
+
+def territories_from_features(features: Iterable[dict[str, Any]]) -> pd.DataFrame:
+    """
+    Args: features of /all_territories response
+    Returns: dataframe indexed by territory_id with name, parent_id, level, geometry columns
+    """
+
+    territory_ids, names, parent_ids, levels, geometries = [], [], [], [], []
+    for feature in features:
+        properties = feature["properties"]
+        territory_ids.append(properties["territory_id"])
+        names.append(properties["name"])
+        parent_ids.append(properties["parent"]["id"])
+        levels.append(properties["level"])
+        geometries.append(feature["geometry"])
+
+    territories_df = pd.DataFrame(
+        {"name": names, "parent_id": parent_ids, "level": levels, "geometry": geometries},
+        index=pd.Index(territory_ids, name="territory_id"),
+    )
+    return territories_df[~territories_df.index.duplicated(keep="last")]
+
+
+def population_from_features(features: Iterable[dict[str, Any]]) -> pd.DataFrame:
+    """
+    Args: features of /territory/indicator_values response
+    Returns: dataframe indexed by territory id with territory_id, population columns
+    """
+
+    territory_ids, populations = [], []
+    for feature in features:
+        properties = feature["properties"]
+        territory_ids.append(properties["territory_id"])
+        populations.append(int(properties["indicators"][0]["value"]))
+
+    population_df = pd.DataFrame({"territory_id": territory_ids, "population": populations}, index=territory_ids)
+    return population_df[~population_df.index.duplicated(keep="last")]
+
+
+class HousesColumns:
+    """
+    Column accumulator for houses features of /physical_objects_geojson response
+
+    Houses without living area properties are skipped and logged,
+    living_area_modeled is preferred to living_area_official, if none of them is available -> 0
+    """
+
+    columns = ["house_id", "territory_id", "living_area"]
+
+    def __init__(self, territory_parent_id: int):
+        self.territory_parent_id = territory_parent_id
+        self.house_ids: list[int] = []
+        self.territory_ids: list[int] = []
+        self.living_areas: list[float] = []
+
+    def add(self, feature: dict[str, Any]) -> None:
+        try:
+            building = feature["properties"]["building"]
+            living_area_modeled = building["properties"]["living_area_modeled"]
+            living_area_official = building["properties"]["living_area_official"]
+        except KeyError as exc:
+            logger.error(f"house with id {feature['properties']['building']['id']} has no living_area property")
+            logger.error(exc, feature)
+            return
+        except TypeError as exc:
+            logger.error(
+                f"something wrong with house properties territory_parent_id: {self.territory_parent_id} "
+                f"house_id: {feature['properties']['territories'][0]['id']}"
+            )
+            logger.error(exc, feature)
+            return
+
+        self.house_ids.append(building["id"])
+        self.territory_ids.append(feature["properties"]["territories"][0]["id"])
+        self.living_areas.append(
+            living_area_modeled if living_area_modeled is not None else (living_area_official or 0)
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns: dataframe indexed by house_id with house_id, territory_id, living_area columns
+        """
+
+        houses_df = pd.DataFrame(
+            {"house_id": self.house_ids, "territory_id": self.territory_ids, "living_area": self.living_areas},
+            index=pd.Index(self.house_ids, name="house_id"),
+            columns=self.columns,
+        )
+        return houses_df[~houses_df.index.duplicated(keep="last")]
+
+
+def houses_from_features(features: Iterable[dict[str, Any]], territory_parent_id: int) -> pd.DataFrame:
+    """
+    Args:
+        features: features of /physical_objects_geojson response
+        territory_parent_id: territory which houses were requested, used in logging only
+    Returns: dataframe indexed by house_id with house_id, territory_id, living_area columns
+    """
+
+    houses = HousesColumns(territory_parent_id)
+    for feature in features:
+        houses.add(feature)
+    return houses.to_dataframe()
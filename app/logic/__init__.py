@@ -1 +1,2 @@
+from .result_store import ResultHandle, ResultStore
 from .territories import TerritoriesService
@@ -0,0 +1,151 @@
+"""
+ForecastCheckpoint is defined here
+it is used to continue a failed or extended forecast from the last completed year
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import os
+import shutil
+import sqlite3
+import typing as tp
+from pathlib import Path
+
+import structlog
+
+from .upload_manifest import UploadManifest
+
+
+logger = structlog.getLogger()
+
+# tables population_restorator forecast reads from its houses db
+FORECAST_DB_TABLES = frozenset(
+    ("houses_tmp", "population_divided", "social_groups_distribution", "social_groups_probabilities")
+)
+
+
+def divided_db_version(db_path: str) -> str:
+    """
+    Returns: version of divided db the forecast starts from,
+    published db is hard linked or copied with its mtime to jobs, newly divided one gets another version
+    """
+
+    stat = os.stat(db_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def is_resumable_db(db_path: str, year: int) -> bool:
+    """
+    Returns: True if forecast output db has the tables of population_restorator and population of the year,
+    so forecast can continue from it
+    """
+
+    try:
+        with contextlib.closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if not FORECAST_DB_TABLES <= tables:
+                return False
+            (has_population,) = conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM population_divided WHERE year = ?)", (year,)
+            ).fetchone()
+            return bool(has_population)
+    except sqlite3.Error:
+        return False
+
+
+class ForecastCheckpoint:
+    """
+    This class keeps forecast output of one territory scenario in its published directory:
+    every year db is placed there and marked completed in the upload manifest right after the year is uploaded.
+
+    Completed years of the forecast from the same first year and the same divided db
+    are not forecasted and uploaded again, forecast continues from the db of the last of them.
+    The directory is locked while a job works with it, so jobs of the same scenario run one after another.
+    """
+
+    lock_filename = ".lock"
+
+    def __init__(self, directory: str, year_begin: int):
+        """
+        Args:
+            directory: str, published forecast directory of the territory scenario
+            year_begin: int, year the forecast starts from
+        """
+        self.directory = Path(directory)
+        self.year_begin = year_begin
+        self.manifest = UploadManifest(directory)
+        self._lock_file: tp.TextIO | None = None
+
+    def lock(self) -> None:
+        """Blocks until other jobs release the directory"""
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.directory / self.lock_filename, "w", encoding="utf-8")  # pylint: disable=R1732
+        try:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info(f"waiting for another job to release forecast directory: {{{self.directory}}}")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except BaseException:
+            lock_file.close()
+            raise
+        self._lock_file = lock_file
+
+    def unlock(self) -> None:
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _is_compatible(self, divided_db: str) -> bool:
+        return self.manifest.meta == {"year_begin": self.year_begin, "divided_db": divided_db}
+
+    def completed_years(self, db_paths: dict[int, str], divided_db: str | None) -> list[int]:
+        """
+        Args:
+            db_paths: dict[int, str], published output db path for every forecasted year
+            divided_db: str | None, version of divided db the forecast starts from, see `divided_db_version`,
+                None if it is not divided yet
+        Returns: years from the first forecasted one which are uploaded and have their db published,
+        the forecast can continue from the last of them. No years are returned if the db of the last one
+        can't be forecasted from, so the forecast is rerun from the start
+        """
+
+        if divided_db is None or not self._is_compatible(divided_db):
+            return []
+        completed = self.manifest.completed_years()
+        years = []
+        for year, db_path in sorted(db_paths.items()):
+            if year not in completed or not Path(db_path).exists():
+                break
+            years.append(year)
+        if years and not is_resumable_db(db_paths[years[-1]], years[-1]):
+            logger.warning(f"forecast db of year {years[-1]} can't be resumed, forecast is rerun: {{{self.directory}}}")
+            return []
+        return years
+
+    def start(self, divided_db: str) -> None:
+        """Binds the manifest to this forecast, must be called after uploads of other forecasts are deleted"""
+
+        if not self._is_compatible(divided_db):
+            self.manifest.set_meta(year_begin=self.year_begin, divided_db=divided_db)
+
+    def begin_year(self, year: int, building_ids: set[int]) -> None:
+        self.manifest.add(year, building_ids)
+
+    def commit_year(self, year: int, db_path: str) -> None:
+        """Publishes output db of the uploaded year and marks the year completed"""
+
+        published = self.directory / Path(db_path).name
+        tmp_path = published.with_name(f".{published.name}.tmp")
+        # forecast may still read the db to compute the next year, so it is not moved
+        try:
+            os.link(db_path, tmp_path)
+        except OSError:
+            shutil.copy2(db_path, tmp_path)
+        os.replace(tmp_path, published)
+        self.manifest.complete(year)
+        logger.info(f"forecast checkpoint, year: {year}, path: {{{published}}}")
@@ -0,0 +1,60 @@
+"""
+ComputeExecutor is defined here
+it is used to run CPU-bound population_restorator calls outside of the event loop
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import typing as tp
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import structlog
+
+
+logger = structlog.getLogger()
+
+
+class ComputeExecutor:
+    """
+    This class runs synchronous calls in a lazily created process pool,
+    so the event loop keeps fetching, deleting and uploading while balance/divide/forecast compute.
+    Arguments and results are passed by pickling, so functions should be importable module-level ones.
+    With max_workers = 0 calls are run in a thread of the current process instead.
+    """
+
+    def __init__(self, max_workers: int = 2, start_method: str = "spawn"):
+        self.max_workers = max_workers
+        self.start_method = start_method
+        self._pool: ProcessPoolExecutor | None = None
+
+    def __getstate__(self) -> dict[str, tp.Any]:
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            logger.debug(f"starting compute process pool, workers: {self.max_workers}, method: {self.start_method}")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self._pool
+
+    async def run(self, func: tp.Callable, /, *args, **kwargs) -> tp.Any:
+        """
+        Returns: result of func(*args, **kwargs) computed in the pool
+        """
+
+        if self.max_workers == 0:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._get_pool(), partial(func, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        """Stops pool processes after running calls are finished"""
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
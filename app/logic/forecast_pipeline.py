@@ -0,0 +1,140 @@
+"""
+ForecastUploadPipeline is defined here
+it is used to upload forecast output year by year while forecasting is still running
+"""
+
+from __future__ import annotations
+
+import asyncio
+import typing as tp
+from pathlib import Path
+
+import structlog
+from population_restorator.forecaster import export_year_age_values
+
+from app.http_clients import SavingClient
+from app.http_clients.common.exceptions import ObjectNotFoundError
+from app.models import ForecastedDistribution
+from app.utils import job_progress
+
+from .checkpoint import ForecastCheckpoint
+
+
+logger = structlog.getLogger()
+
+_END = object()
+
+
+class ForecastUploadPipeline:
+    """
+    This class runs three concurrent stages connected by bounded queues:
+    reader exports every finished year db, converter turns it into ForecastedDistribution
+    and uploader posts it to saving api, so only a couple of years are kept in memory at once.
+
+    Forecast writes year dbs one after another, year db is considered finished
+    when the next year db appears or the forecast is done.
+    """
+
+    def __init__(
+        self,
+        saving_client: SavingClient,
+        db_paths: dict[int, str],
+        territory_id: int,
+        scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"],
+        queue_size: int = 1,
+        poll_interval: float = 1.0,
+        verbose: bool = False,
+        checkpoint: ForecastCheckpoint | None = None,
+    ):
+        """
+        Args:
+            saving_client: SavingClient, client used to upload years
+            db_paths: dict[int, str], forecast output db path for every forecasted year
+            territory_id: int, id of the forecasted territory
+            scenario: Literal, scenario of the forecast
+            queue_size: int, size of queues between stages
+            poll_interval: float, seconds between checks for the next finished year db
+            verbose: bool, population_restorator export verbosity
+            checkpoint: ForecastCheckpoint | None, every uploaded year is checkpointed to
+        """
+        self.saving_client = saving_client
+        self.db_paths = db_paths
+        self.territory_id = territory_id
+        self.scenario = scenario
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.verbose = verbose
+        self.checkpoint = checkpoint
+
+    async def _wait_for_year(self, year: int, forecast: asyncio.Future) -> None:
+        next_db_path = self.db_paths.get(year + 1)
+        while not forecast.done() and not (next_db_path is not None and Path(next_db_path).exists()):
+            await asyncio.sleep(self.poll_interval)
+        if forecast.done() and forecast.exception() is not None:
+            raise forecast.exception()
+
+    async def _read(self, forecast: asyncio.Future, output: asyncio.Queue) -> None:
+        progress = job_progress()
+        for year, db_path in self.db_paths.items():
+            await self._wait_for_year(year, forecast)
+            progress.advance(f"forecast_years:{self.scenario}")
+
+            if not Path(db_path).exists():
+                logger.info(f"no such db {db_path}")
+                continue
+
+            logger.info(f"trying to get db data, db_path: {{{db_path}}}")
+            year_data = await asyncio.to_thread(
+                export_year_age_values, db_path=db_path, territory_id=self.territory_id, verbose=self.verbose
+            )
+            if year_data is None:
+                logger.error(f"got no data from, db_path: {{{db_path}}}")
+                raise ObjectNotFoundError()
+
+            await output.put((year, year_data))
+        await output.put(_END)
+
+    async def _convert(self, source: asyncio.Queue, output: asyncio.Queue) -> None:
+        while (item := await source.get()) is not _END:
+            year, year_data = item
+            distribution = await asyncio.to_thread(
+                ForecastedDistribution.from_year_data, year_data, self.scenario, year
+            )
+            await output.put(distribution)
+        await output.put(_END)
+
+    async def _upload(self, source: asyncio.Queue) -> None:
+        while (distribution := await source.get()) is not _END:
+            logger.info(f"saving forecasted data, year: {distribution.year}, rows: {len(distribution)}")
+            if self.checkpoint is not None:
+                await asyncio.to_thread(self.checkpoint.begin_year, distribution.year, distribution.building_ids())
+            await self.saving_client.post_forecasted_data(distribution)
+            if self.checkpoint is not None:
+                await asyncio.to_thread(
+                    self.checkpoint.commit_year, distribution.year, self.db_paths[distribution.year]
+                )
+
+    async def run(self, forecast: tp.Awaitable) -> None:
+        """
+        Args:
+            forecast: awaitable of the forecast which writes year dbs, e.g. ComputeExecutor.run(prforecast, ...)
+        """
+
+        forecast = asyncio.ensure_future(forecast)
+        exported: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        converted: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        stages = [
+            asyncio.ensure_future(self._read(forecast, exported)),
+            asyncio.ensure_future(self._convert(exported, converted)),
+            asyncio.ensure_future(self._upload(converted)),
+        ]
+
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for stage in stages:
+                stage.cancel()
+            # forecast can't be interrupted, its dbs are not left being written after the job ends
+            await asyncio.wait([forecast])
+
+        await forecast
@@ -0,0 +1,53 @@
+"""
+JobContext is defined here
+it is a request-scoped memo used to fetch every upstream resource once per job
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import typing as tp
+from collections.abc import Awaitable, Hashable
+
+from .workspace import JobWorkspace
+
+
+class JobContext:
+    """
+    This class coalesces identical client calls made during one job:
+    concurrent calls with the same arguments await one shared task
+    and results of completed calls are reused, failed calls are not remembered.
+    It also carries the job working directory used by divide and forecast
+    """
+
+    def __init__(self, workspace: JobWorkspace | None = None):
+        self.workspace = workspace
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    @staticmethod
+    def _make_key(func: tp.Callable[..., Awaitable], args: tuple, kwargs: dict[str, tp.Any]) -> Hashable:
+        bound_arguments = inspect.signature(func).bind(*args, **kwargs)
+        bound_arguments.apply_defaults()
+        owner = getattr(func, "__self__", None)
+        return (id(owner), func.__qualname__, tuple(bound_arguments.arguments.items()))
+
+    async def call(self, func: tp.Callable[..., Awaitable], *args, **kwargs) -> tp.Any:
+        """
+        Args:
+            func: async function or bound client method, arguments should be hashable
+        Returns: result of func(*args, **kwargs), awaited once per job for the same arguments
+        """
+
+        key = self._make_key(func, args, kwargs)
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = future
+
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            if future.done() and self._calls.get(key) is future:
+                del self._calls[key]
+            raise
@@ -0,0 +1,184 @@
+"""
+ResultStore is defined here
+it is used to keep big job results (balanced houses, divided distribution) out of rq job pickles
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import time
+import typing as tp
+from dataclasses import dataclass
+from pathlib import Path
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow as pa
+import structlog
+from pyarrow import feather
+from redis import Redis
+from rq import get_current_job
+
+from app.http_clients.common.exceptions import ObjectNotFoundError
+from app.utils.config import ResultStoreConfig
+
+
+logger = structlog.getLogger()
+
+_JSON_COLUMNS_KEY = b"population_restorator_api:json_columns"
+
+
+@dataclass(frozen=True)
+class ResultHandle:
+    """Small reference to stored job result tables, it is what rq keeps as job return value"""
+
+    backend: tp.Literal["local", "redis"]
+    key: str
+    tables: tuple[str, ...]
+
+
+def _to_arrow(data: pd.DataFrame | pd.Series) -> pa.Table:
+    """Converts frame to arrow table, dict and list object columns (e.g. geojson geometry) are stored as json"""
+
+    df = data.to_frame(name=data.name or "value") if isinstance(data, pd.Series) else data.copy(deep=False)
+    json_columns = []
+    for column in df.columns[df.dtypes == object]:
+        first = df[column].dropna().head(1)
+        if len(first) and isinstance(first.iloc[0], (dict, list)):
+            df[column] = df[column].map(lambda value: json.dumps(value) if value is not None else None)
+            json_columns.append(str(column))
+
+    table = pa.Table.from_pandas(df)
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), _JSON_COLUMNS_KEY: json.dumps(json_columns)})
+
+
+def _from_arrow(table: pa.Table) -> pd.DataFrame:
+    json_columns = json.loads((table.schema.metadata or {}).get(_JSON_COLUMNS_KEY, b"[]"))
+    df = table.to_pandas()
+    for column in json_columns:
+        if column in df.columns:
+            df[column] = df[column].map(lambda value: json.loads(value) if value is not None else None)
+    return df
+
+
+class ResultStore:
+    """
+    Stores job result tables as compressed Arrow IPC (feather v2) files,
+    either in a local directory shared by api and workers or in redis with a ttl.
+    Tables are read by columns, local uncompressed ones are memory-mapped
+    """
+
+    prefix = "population-restorator-api:results"
+
+    def __init__(self, config: ResultStoreConfig, redis_host: str, redis_port: int, redis_db: int):
+        self.config = config
+        self.redis_host = redis_host
+        self.redis_port = redis_port
+        self.redis_db = redis_db
+        self._redis: Redis | None = None
+
+    def __getstate__(self) -> dict[str, tp.Any]:
+        state = self.__dict__.copy()
+        state["_redis"] = None
+        return state
+
+    @property
+    def redis(self) -> Redis:
+        if self._redis is None:
+            self._redis = Redis(host=self.redis_host, port=self.redis_port, db=self.redis_db)
+        return self._redis
+
+    def _path(self, key: str, table: str) -> Path:
+        return Path(self.config.path) / key / f"{table}.arrow"
+
+    def _redis_key(self, key: str, table: str) -> str:
+        return f"{self.prefix}:{key}:{table}"
+
+    def save(self, name: str, tables: dict[str, pd.DataFrame | pd.Series]) -> ResultHandle:
+        """
+        Args:
+            name: str, kind of the result, e.g. "balance"
+            tables: dict[str, pd.DataFrame | pd.Series], result tables by name
+        Returns: handle to be returned from the job instead of the tables
+        """
+
+        job = get_current_job()
+        key = f"{name}-{job.id if job is not None else uuid4().hex}"
+        backend = self.config.backend
+
+        if backend == "local":
+            self.remove_expired()
+        for table_name, data in tables.items():
+            table = _to_arrow(data)
+            if backend == "local":
+                path = self._path(key, table_name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f".{path.name}.{uuid4().hex[:8]}")
+                feather.write_feather(table, str(tmp_path), compression=self.config.compression)
+                os.replace(tmp_path, path)
+            else:
+                sink = io.BytesIO()
+                feather.write_feather(table, sink, compression=self.config.compression)
+                self.redis.set(self._redis_key(key, table_name), sink.getvalue(), ex=self.config.ttl)
+            logger.debug(f"stored job result table, key: {key}, table: {table_name}, rows: {table.num_rows}")
+
+        return ResultHandle(backend=backend, key=key, tables=tuple(tables))
+
+    def load(self, handle: ResultHandle, table: str, columns: tp.Iterable[str] | None = None) -> pd.DataFrame:
+        """
+        Args:
+            handle: ResultHandle, job return value
+            table: str, name of the table to load
+            columns: Iterable[str] | None, columns to read, missing ones are skipped, None for all
+        """
+
+        if table not in handle.tables:
+            raise ObjectNotFoundError()
+
+        if handle.backend == "local":
+            path = self._path(handle.key, table)
+            if not path.exists():
+                logger.error(f"job result is expired or removed, key: {handle.key}, table: {table}")
+                raise ObjectNotFoundError()
+
+            def open_source():
+                return pa.memory_map(str(path))
+
+        else:
+            payload = self.redis.get(self._redis_key(handle.key, table))
+            if payload is None:
+                logger.error(f"job result is expired or removed, key: {handle.key}, table: {table}")
+                raise ObjectNotFoundError()
+
+            def open_source():
+                return pa.BufferReader(payload)
+
+        if columns is not None:
+            schema_names = set(pa.ipc.open_file(open_source()).schema.names)
+            columns = [column for column in columns if column in schema_names]
+        return _from_arrow(feather.read_table(open_source(), columns=columns, memory_map=True))
+
+    def delete(self, handle: ResultHandle) -> None:
+        for table in handle.tables:
+            if handle.backend == "local":
+                self._path(handle.key, table).unlink(missing_ok=True)
+            else:
+                self.redis.delete(self._redis_key(handle.key, table))
+
+    def remove_expired(self) -> None:
+        """Removes local results older than ttl, redis ones expire by themselves"""
+
+        results_dir = Path(self.config.path)
+        if not results_dir.is_dir():
+            return
+        expired = time.time() - self.config.ttl
+        for result_dir in results_dir.iterdir():
+            try:
+                if result_dir.stat().st_mtime < expired:
+                    for path in result_dir.iterdir():
+                        path.unlink(missing_ok=True)
+                    result_dir.rmdir()
+            except OSError:
+                continue
@@ -7,9 +7,13 @@ and perfom population-restorator library executing
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import errno
+import os
+import shutil
 import typing as tp
 from datetime import date
+from functools import wraps
 from os import remove as os_remove
 from pathlib import Path
 
@@ -29,9 +33,38 @@ from app.http_clients import (
     UrbanClient,
 )
 from app.http_clients.common.exceptions import ObjectNotFoundError
-from app.models import FertilityInterval, UrbanSocialDistribution
+from app.models import BirthStats, FertilityInterval, ForecastedDistribution
+from app.utils import job_progress
 from app.utils.config import PopulationRestoratorConfig
 
+from .checkpoint import ForecastCheckpoint, divided_db_version
+from .compute import ComputeExecutor
+from .forecast_pipeline import ForecastUploadPipeline
+from .job_context import JobContext
+from .result_store import ResultHandle, ResultStore
+from .upload_manifest import UploadManifest, read_house_ids
+from .workspace import JobWorkspace
+
+
+def releases_sessions(func: tp.Callable) -> tp.Callable:
+    """
+    This decorator closes pooled http sessions of the service clients
+    when the outermost job method returns, every rq job runs in its own event loop
+    so sessions can't be reused after it
+    """
+
+    @wraps(func)
+    async def _wrapper(self: "TerritoriesService", *args, **kwargs):
+        self._running_jobs += 1
+        try:
+            return await func(self, *args, **kwargs)
+        finally:
+            self._running_jobs -= 1
+            if self._running_jobs == 0:
+                await self.close()
+
+    return _wrapper
+
 
 class TerritoriesService:
     """
@@ -46,6 +79,7 @@ class TerritoriesService:
         socdemo_client: SocDemoClient,
         saving_client: SavingClient,
         population_restorator_config: PopulationRestoratorConfig,
+        result_store: ResultStore,
         debug: bool,
     ):
 
@@ -53,14 +87,41 @@ class TerritoriesService:
         self.socdemo_client = socdemo_client
         self.saving_client = saving_client
         self.population_restorator_config = population_restorator_config
+        self.result_store = result_store
         self.debug = debug
+        self.compute = ComputeExecutor(
+            max_workers=population_restorator_config.compute.max_workers,
+            start_method=population_restorator_config.compute.start_method,
+        )
+        self._running_jobs = 0
+
+    async def close(self) -> None:
+        """Closes pooled http sessions of all clients and stops compute processes"""
+        await asyncio.gather(self.urban_client.close(), self.socdemo_client.close(), self.saving_client.close())
+        self.compute.shutdown()
+
+    # balanced houses columns population_restorator divide works with, geometry is not loaded
+    DIVIDE_HOUSES_COLUMNS = ("id", "house_id", "territory_id", "living_area", "population")
 
-    async def balance(self, territory_id: int, start_date: date | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    @releases_sessions
+    async def balance(self, territory_id: int, start_date: date | None = None) -> ResultHandle:
         """
-        This method gathers necessary territories data from UrbanClient and starts balancing
+        This method gathers necessary territories data from UrbanClient and starts balancing,
+        balanced dataframes are put to the result store
         Args:
             territory_id: int, id of the territory which is going to be balanced
             start_date: date | None, the earliest date to be searched for, None for latest.
+        Returns:
+            ResultHandle of "territories" and "houses" tables, see _balance
+        """
+
+        territories_df, houses_df = await self._balance(territory_id, start_date)
+        return await asyncio.to_thread(
+            self.result_store.save, "balance", {"territories": territories_df, "houses": houses_df}
+        )
+
+    async def _balance(self, territory_id: int, start_date: date | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
         Returns:
             territories_df: pd.DataFrame, balanced territories
                 id, name, population, inner_territories_population, houses_number, houses_population, total_living_area
@@ -73,40 +134,81 @@ class TerritoriesService:
                 ...
         """
 
-        internal_territories_df, internal_houses_df, population, main_territory = await asyncio.gather(
-            self.urban_client.get_internal_territories(territory_id),
-            self.urban_client.get_houses_from_territories(territory_id),
-            self.urban_client.get_population_from_territory(territory_id, start_date),
-            self.urban_client.get_territory(territory_id),
-        )
+        progress = job_progress()
+        with progress.stage("fetch"):
+            internal_territories_df, internal_houses_df, population, main_territory = await asyncio.gather(
+                self.urban_client.get_internal_territories(territory_id),
+                self.urban_client.get_houses_from_territories(territory_id),
+                self.urban_client.get_population_from_territory(territory_id, start_date),
+                self.urban_client.get_territory(territory_id),
+            )
 
-        internal_territories_df = await self.urban_client.bind_population_to_territories(internal_territories_df)
+            internal_territories_df = await self.urban_client.bind_population_to_territories(internal_territories_df)
 
         # internal_territories_df.to_csv("population-restorator/sample_data/balancer/territories.csv")
         # internal_houses_df.to_csv("population-restorator/sample_data/balancer/houses.csv")
 
-        return prbalance(
-            population,
-            internal_territories_df,
-            internal_houses_df,
-            main_territory,
-            self.debug,
+        with progress.stage("balance"):
+            return await self.compute.run(
+                prbalance,
+                population,
+                internal_territories_df,
+                internal_houses_df,
+                main_territory,
+                self.debug,
+            )
+
+    @releases_sessions
+    async def divide(
+        self,
+        territory_id: int,
+        start_date: date | None = None,
+        balanced: ResultHandle | None = None,
+    ) -> ResultHandle:
+        """
+        This method runs population-restorator divide in its own working directory,
+        publishes divided db for restore and puts divide output to the result store
+
+        Args:
+            territory_id: int, id of the territory that is going to be divided
+            start_date: date, the earliest date used to search information about, if None then used the latest
+            balanced: ResultHandle | None, result of the balance job to divide,
+                if None then balance starts first, otherwise balance is skipped
+
+        Returns:
+            ResultHandle of "houses" and "distribution" tables, see _divide
+        """
+
+        houses_df = None
+        if balanced is not None:
+            houses_df = await asyncio.to_thread(self.result_store.load, balanced, "houses", self.DIVIDE_HOUSES_COLUMNS)
+
+        with JobWorkspace(self.population_restorator_config.working_dirs) as workspace:
+            houses_df, distribution = await self._divide(JobContext(workspace), territory_id, houses_df, start_date)
+
+        return await asyncio.to_thread(
+            self.result_store.save, "divide", {"houses": houses_df, "distribution": distribution}
         )
 
-    async def divide(
-        self, territory_id: int, houses_df: pd.DataFrame | None = None, start_date: date | None = None
+    async def _divide(
+        self,
+        ctx: JobContext,
+        territory_id: int,
+        houses_df: pd.DataFrame | None = None,
+        start_date: date | None = None,
     ) -> tuple[pd.DataFrame, pd.Series]:
         """
         This method uses balanced houses dataframe
         and runs population-restorator divide method
-        which saves results into sqlite db
+        which saves results into sqlite db of the job workspace and publishes it
 
         Args:
+            ctx: JobContext, memo and workspace of the job this divide is a part of
             territory_id: int, id of the territory that is going to be divided
             houses_df: pd.DataFrame, balanced houses, optional argument for population_restorator divide input
                         if None then balance starts first, otherwise balance is skipped, used previous balance return
-                id, house_id, territory_id, living_area, geometry, population
-                10, 123438,   328,          963.81,      {...},    41
+                id, house_id, territory_id, living_area, population
+                10, 123438,   328,          963.81,      41
                 ...
             start_date: date, the earliest date used to search information about, if None then used the latest
 
@@ -114,30 +216,57 @@ class TerritoriesService:
             houses_df: pd.DataFrame, todo
             distribution: pd.Series, todo
         """
-        if houses_df is None:
-            test_results = await self.balance(territory_id=territory_id, start_date=start_date)
-            # test_results[0].to_csv(f"./territories{territory_id}.csv")
-            # test_results[1].to_csv(f"./houses{territory_id}.csv")
-            houses_df = test_results[1]
-
         year = start_date.year if start_date is not None else None
+        progress = job_progress()
+
+        async def get_population_pyramid():
+            with progress.stage("fetch"):
+                oktmo_code: int = await ctx.call(self.urban_client.get_oktmo_of_territory_by_urban_db_id, territory_id)
+                return await ctx.call(self.socdemo_client.get_population_pyramid, territory_id, oktmo_code, year)
 
-        oktmo_code: int = await self.urban_client.get_oktmo_of_territory_by_urban_db_id(territory_id)
-        population_pyramid = await self.socdemo_client.get_population_pyramid(territory_id, oktmo_code, year)
+        if houses_df is None:
+            # pyramid is fetched while balance is being computed
+            test_results, population_pyramid = await asyncio.gather(
+                self._balance(territory_id=territory_id, start_date=start_date),
+                get_population_pyramid(),
+            )
+            houses_df = test_results[1]
+        else:
+            population_pyramid = await get_population_pyramid()
 
         men_prob = [x / sum(population_pyramid.men) for x in population_pyramid.men]
         women_prob = [x / sum(population_pyramid.women) for x in population_pyramid.women]
         primary = [SocialGroupWithProbability.from_values("people_pyramid", 1, men_prob, women_prob)]
         distribution = SocialGroupsDistribution(primary, [])
 
-        return prdivide(
-            territory_id=territory_id,
-            houses_df=houses_df,
-            distribution=distribution,
-            year=year,
-            working_db_path=self.population_restorator_config.working_dirs.divide_working_db_path,
-            verbose=self.debug,
-        )
+        with progress.stage("divide"):
+            result = await self.compute.run(
+                prdivide,
+                territory_id=territory_id,
+                houses_df=houses_df,
+                distribution=distribution,
+                year=year,
+                working_db_path=ctx.workspace.divide_db_path,
+                verbose=self.debug,
+            )
+            await asyncio.to_thread(ctx.workspace.publish_divide_db, territory_id, year)
+        return result
+
+    @staticmethod
+    def get_forecast_db_paths(
+        input_dir: str,
+        territory_id: int,
+        year_begin: int,
+        years: int,
+        scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"],
+    ) -> dict[int, str]:
+        """
+        Returns: forecast output db path for every forecasted year, as population_restorator names them
+        """
+        return {
+            year: os.path.join(input_dir, f"year_{year}_terr_{territory_id}_scen_{scenario}.sqlite")
+            for year in range(year_begin + 1, year_begin + years + 1)
+        }
 
     async def get_forecasted_data(
         self,
@@ -146,7 +275,7 @@ class TerritoriesService:
         year_begin: int,
         years: int,
         scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"],
-    ) -> dict[str, set[UrbanSocialDistribution]]:
+    ) -> dict[str, ForecastedDistribution]:
         """
         This method extracts from forecast output dbs
         Args:
@@ -156,17 +285,13 @@ class TerritoriesService:
             year_begin: int, first year to be saved
             years: int, for how many years saving is going to be
         """
-        db_paths = [
-            str(input_dir + f"year_{year}_terr_{territory_id}_scen_{scenario}.sqlite")
-            for year in range(year_begin + 1, year_begin + years + 1)
-        ]
-        cur_year = year_begin + 1
+        db_paths = self.get_forecast_db_paths(input_dir, territory_id, year_begin, years, scenario)
 
         logger = structlog.get_logger()
 
-        buildings_data: dict[str, set[UrbanSocialDistribution]] = {}
+        buildings_data: dict[str, ForecastedDistribution] = {}
 
-        for db_path in db_paths:
+        for cur_year, db_path in db_paths.items():
             logger.info(f"trying to get db data, db_path: {{{db_path}}}")
             if not (Path(db_path).exists()):
                 logger.info(f"no such db {db_path}")
@@ -177,31 +302,7 @@ class TerritoriesService:
                 logger.error(f"got no data from, db_path: {{{db_path}}}")
                 raise ObjectNotFoundError()
 
-            buildings_year_data: set[UrbanSocialDistribution] = set()
-            for index, values in year_data.iterrows():
-                buildings_year_data.add(
-                    UrbanSocialDistribution(
-                        building_id=values["house_id"],
-                        scenario=scenario,
-                        year=cur_year,
-                        sex="MALE",
-                        age=values["age"],
-                        value=values["men"],
-                    )
-                )
-                buildings_year_data.add(
-                    UrbanSocialDistribution(
-                        building_id=values["house_id"],
-                        scenario=scenario,
-                        year=cur_year,
-                        sex="FEMALE",
-                        age=values["age"],
-                        value=values["women"],
-                    )
-                )
-            cur_year += 1
-
-            buildings_data[db_path] = buildings_year_data
+            buildings_data[db_path] = ForecastedDistribution.from_year_data(year_data, scenario, cur_year)
 
         return buildings_data
 
@@ -212,53 +313,51 @@ class TerritoriesService:
         year_begin: int,
         years: int,
         scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"],
+        keep_years: set[int] | None = None,
     ):
         """
-        This method extracts from forecast output dbs and deletes it from saving api
+        This method collects ids of buildings previous forecast was uploaded for and deletes it from saving api,
+        ids are taken from the upload manifest or, for outputs without one, from house_id column of output dbs
         Args:
             input_dir: str, path for directory which contains databases per year
             territory_id: int, id of the main territory which was
                           divided before and which data is going was saved
             year_begin: int, first year was saved
             years: int, for how many years saving was
+            keep_years: set[int] | None, years which uploaded data and output dbs are kept
         """
-        buildings_ids: dict[int, set[int]] = {
-            year: set()
-            for year in range(year_begin+1, year_begin+years+1)
-        }
-
-        buildings_db_data = await self.get_forecasted_data(input_dir, territory_id, year_begin, years, scenario)
-        for key, values in buildings_db_data.items():
-            year = next(iter(values)).year
-            for house in values:
-                buildings_ids[year].add(house.building_id)
-
-        building_ids_urban_api: dict[int, set[int]] = {}
-        for index, house in (await self.urban_client.get_houses_from_territories(territory_id)).iterrows():
-            cur_year_houses = set()
-            for cur_year in range(year_begin+1, year_begin+years+1):
-                cur_year_houses.add(
-                    house["house_id"],
-                )
-            for cur_year in range(year_begin + 1, year_begin + years + 1):
-                building_ids_urban_api[cur_year] = cur_year_houses
-
-        for db_path, values in buildings_db_data.items():
-            year = next(iter(values)).year
-            buildings_ids[year] = buildings_ids[year] | building_ids_urban_api[year]
-
-
         logger = structlog.getLogger()
-        logger.info(f"deleting previous forecasted data from previous runs")
-        await self.saving_client.delete_forecasted_data(scenario, buildings_ids)
 
-        for db_path in buildings_db_data.keys():
-            logger.info(f"deleting previous forecasted data, db_path: {{ {db_path} }}")
+        keep_years = keep_years or set()
+        db_paths = self.get_forecast_db_paths(input_dir, territory_id, year_begin, years, scenario)
+        db_paths = {year: db_path for year, db_path in db_paths.items() if year not in keep_years}
+        manifest = UploadManifest(input_dir)
+        uploaded = await asyncio.to_thread(manifest.load)
+
+        buildings_ids: dict[int, set[int]] = {}
+        for year, db_path in db_paths.items():
+            if year in uploaded:
+                buildings_ids[year] = uploaded[year]
+            elif Path(db_path).exists():
+                buildings_ids[year] = await asyncio.to_thread(read_house_ids, db_path)
+
+        buildings_ids = {year: ids for year, ids in buildings_ids.items() if ids}
+        if not buildings_ids:
+            logger.info("no previous forecasted data to delete")
+        else:
+            logger.info(
+                f"deleting previous forecasted data from previous runs, years: {sorted(buildings_ids)},"
+                f" buildings: {sum(len(ids) for ids in buildings_ids.values())}"
+            )
+            await self.saving_client.delete_forecasted_data(scenario, buildings_ids)
+
+        for db_path in db_paths.values():
             try:
                 os_remove(db_path)
             except OSError as e:
                 if e.errno != errno.ENOENT:
                     raise
+        await asyncio.to_thread(manifest.forget, set(db_paths))
 
     async def insert_forecasted_data(
         self,
@@ -267,6 +366,7 @@ class TerritoriesService:
         year_begin: int,
         years: int,
         scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"],
+        checkpoint: ForecastCheckpoint | None = None,
     ):
         """
         This method extracts from forecast output dbs and posts it to saving api
@@ -276,6 +376,7 @@ class TerritoriesService:
                           divided before and which data is going to be saved
             year_begin: int, first year to be saved
             years: int, for how many years saving is going to be
+            checkpoint: ForecastCheckpoint | None, every uploaded year is checkpointed to
         """
 
         buildings_data = await self.get_forecasted_data(input_dir, territory_id, year_begin, years, scenario)
@@ -284,15 +385,21 @@ class TerritoriesService:
         for db_path, values in buildings_data.items():
             logger.info(f"saving forecasted data, db_path: {{ {db_path} }}")
 
+            if checkpoint is not None:
+                await asyncio.to_thread(checkpoint.begin_year, values.year, values.building_ids())
             await self.saving_client.post_forecasted_data(values)
+            if checkpoint is not None:
+                await asyncio.to_thread(checkpoint.commit_year, values.year, db_path)
 
+    @releases_sessions
     async def restore(
         self,
         territory_id: int,
         year_begin: int,
         years: int,
-        scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"],
-        from_scratch: bool,
+        scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"] = "NEUTRAL",
+        from_scratch: bool = True,
+        scenarios: list[tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"]] | None = None,
     ) -> tp.NoReturn:
         """
         Lasciate ogne speranza, voi ch’entrate
@@ -304,50 +411,209 @@ class TerritoriesService:
             years: int, amount of years to be forecasted
                 if year_begin is 2025 and years is 2, forecasting for 2026 and 2027
             scenario: Literal, affects the birthrate stats
-            from_scratch: bool, if true dividing first, otherwise using dividing data from divide output db
+            from_scratch: bool, if true dividing first, otherwise using the last published divided db of the territory,
+                forecast of the same divided db and year_begin continues from its last completed year then,
+                so a failed or extended (by more years) forecast computes and uploads only missing years
+            scenarios: list[Literal] | None, if given, forecasts for all these scenarios are computed concurrently
+                from one upstream fetch and one divide, `scenario` is ignored then
         """
 
-        oktmo_code = await self.urban_client.get_oktmo_of_territory_by_urban_db_id(territory_id)
-        coeffs = await self.socdemo_client.get_surviability_coeffs_from_last_pyramids(
-            territory_id, oktmo_code, year_begin
-        )
+        scenarios = list(dict.fromkeys(scenarios)) if scenarios else [scenario]
+
+        # every upstream resource is fetched once per job, divide reuses oktmo code and year_begin pyramid,
+        # divided and forecast dbs are written to the job directory, forecast years are published once uploaded
+        with JobWorkspace(self.population_restorator_config.working_dirs) as workspace:
+            await self._restore(JobContext(workspace), territory_id, year_begin, years, scenarios, from_scratch)
+
+    async def _restore(
+        self,
+        ctx: JobContext,
+        territory_id: int,
+        year_begin: int,
+        years: int,
+        scenarios: list[tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"]],
+        from_scratch: bool,
+    ) -> None:
+        with job_progress().stage("fetch"):
+            oktmo_code = await ctx.call(self.urban_client.get_oktmo_of_territory_by_urban_db_id, territory_id)
+            pyramid = await ctx.call(self.socdemo_client.get_population_pyramid, territory_id, oktmo_code, year_begin)
+            previous_pyramid = await ctx.call(
+                self.socdemo_client.get_population_pyramid, territory_id, oktmo_code, pyramid.year - 1
+            )
+        coeffs = self.socdemo_client.surviability_coeffs_from_pyramids(pyramid, previous_pyramid)
 
         fertility_interval = FertilityInterval(**self.population_restorator_config.fertility_interval.model_dump())
-        birth_stats = await self.socdemo_client.get_birth_stats(
-            territory_id, fertility_interval, oktmo_code=oktmo_code, year=year_begin
+        birth_stats = self.socdemo_client.birth_stats_from_pyramid(pyramid, fertility_interval)
+
+        workspace = ctx.workspace
+        checkpoints = {
+            scenario: ForecastCheckpoint(workspace.published_forecast_dir(territory_id, scenario), year_begin)
+            for scenario in scenarios
+        }
+        async with contextlib.AsyncExitStack() as stack:
+            # locked in the same order, so jobs with common scenarios never wait for each other crosswise
+            for scenario in sorted(checkpoints):
+                await asyncio.to_thread(checkpoints[scenario].lock)
+                stack.callback(checkpoints[scenario].unlock)
+
+            if from_scratch:
+                # newly divided db can't continue previous forecasts,
+                # so all previous data is deleted while divide is being computed
+                completed_years = {scenario: [] for scenario in scenarios}
+                await asyncio.gather(
+                    self._divide(ctx, territory_id, start_date=date(year_begin, 1, 1)),
+                    self._delete_previous_forecasts(territory_id, year_begin, years, checkpoints, completed_years),
+                )
+                divided_db = divided_db_version(workspace.divide_db_path)
+            else:
+                await asyncio.to_thread(workspace.use_published_divide_db, territory_id, year_begin)
+                divided_db = divided_db_version(workspace.divide_db_path)
+                completed_years = {
+                    scenario: checkpoint.completed_years(
+                        self.get_forecast_db_paths(
+                            str(checkpoint.directory), territory_id, year_begin, years, scenario
+                        ),
+                        divided_db,
+                    )
+                    for scenario, checkpoint in checkpoints.items()
+                }
+                await self._delete_previous_forecasts(territory_id, year_begin, years, checkpoints, completed_years)
+
+            for checkpoint in checkpoints.values():
+                await asyncio.to_thread(checkpoint.start, divided_db)
+
+            # scenarios are forecasted in separate compute processes from the same divided db
+            forecasts = [
+                asyncio.ensure_future(
+                    self._forecast(
+                        ctx,
+                        territory_id,
+                        year_begin,
+                        years,
+                        scenario,
+                        coeffs,
+                        birth_stats,
+                        checkpoints[scenario],
+                        completed_years[scenario],
+                    )
+                )
+                for scenario in scenarios
+            ]
+            try:
+                await asyncio.gather(*forecasts)
+            except BaseException:
+                for forecast in forecasts:
+                    forecast.cancel()
+                await asyncio.gather(*forecasts, return_exceptions=True)
+                raise
+
+    async def _delete_previous_forecasts(
+        self,
+        territory_id: int,
+        year_begin: int,
+        years: int,
+        checkpoints: dict[str, ForecastCheckpoint],
+        completed_years: dict[str, list[int]],
+    ) -> None:
+        await asyncio.gather(
+            *(
+                self.delete_previous_forecasted_data(
+                    str(checkpoint.directory),
+                    territory_id=territory_id,
+                    year_begin=year_begin,
+                    years=years,
+                    scenario=scenario,
+                    keep_years=set(completed_years[scenario]),
+                )
+                for scenario, checkpoint in checkpoints.items()
+            )
         )
-        birth_stats.adapt_to_scenario(scenario)
 
-        if from_scratch:
-            await self.divide(territory_id, start_date=date(year_begin, 1, 1))
+    async def _forecast(
+        self,
+        ctx: JobContext,
+        territory_id: int,
+        year_begin: int,
+        years: int,
+        scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"],
+        coeffs: SurvivabilityCoefficients,
+        birth_stats: BirthStats,
+        checkpoint: ForecastCheckpoint,
+        completed_years: list[int],
+    ) -> None:
+        """
+        This method forecasts one scenario from the divided db of the job workspace
+        or from the last completed year of the checkpoint, uploads forecasted years to saving api
+        and checkpoints every uploaded year
+        """
 
-        await self.delete_previous_forecasted_data(
-            self.population_restorator_config.working_dirs.forecast_working_dir_path,
-            territory_id=territory_id,
-            year_begin=year_begin,
-            years=years,
-            scenario=scenario,
-        )
+        logger = structlog.getLogger()
+        workspace = ctx.workspace
+        birth_stats = birth_stats.model_copy(deep=True)
+        birth_stats.adapt_to_scenario(scenario)
 
-        prforecast(
-            houses_db=self.population_restorator_config.working_dirs.divide_working_db_path,
-            territory_id=territory_id,
-            coeffs=coeffs,
-            year_begin=year_begin,
-            years=years,
-            boys_to_girls=birth_stats.boys_to_girls,
-            fertility_coefficient=birth_stats.fertility_coefficient,
-            fertility_begin=birth_stats.fertility_interval.start,
-            fertility_end=birth_stats.fertility_interval.end,
-            scenario=scenario,
-            verbose=self.debug,
-            working_dir=self.population_restorator_config.working_dirs.forecast_working_dir_path,
-        )
+        year_end = year_begin + years
+        resume_year = completed_years[-1] if completed_years else year_begin
+        progress = job_progress()
+        years_counter = f"forecast_years:{scenario}"
+        progress.start_counter(years_counter, total=years, done=resume_year - year_begin)
+        if resume_year == year_end:
+            logger.info(f"forecast is already completed, scenario: {scenario}, years: {year_begin + 1}-{year_end}")
+            return
+
+        forecast_working_dir = workspace.forecast_dir(scenario)
+        # prforecast writes to its houses db, so every scenario starts from its own writable copy:
+        # concurrent scenarios never share it and neither the read-only divided db nor published year dbs are modified
+        houses_db = workspace.scenario_db_path(scenario)
+        source_db = workspace.divide_db_path
+        if completed_years:
+            logger.info(f"resuming forecast, scenario: {scenario}, completed years: {year_begin + 1}-{resume_year}")
+            (source_db,) = self.get_forecast_db_paths(
+                str(checkpoint.directory), territory_id, resume_year - 1, 1, scenario
+            ).values()
+        await asyncio.to_thread(shutil.copyfile, source_db, houses_db)
+
+        forecast_kwargs = {
+            "houses_db": houses_db,
+            "territory_id": territory_id,
+            "coeffs": coeffs,
+            "year_begin": resume_year,
+            "years": year_end - resume_year,
+            "boys_to_girls": birth_stats.boys_to_girls,
+            "fertility_coefficient": birth_stats.fertility_coefficient,
+            "fertility_begin": birth_stats.fertility_interval.start,
+            "fertility_end": birth_stats.fertility_interval.end,
+            "scenario": scenario,
+            "verbose": self.debug,
+            "working_dir": forecast_working_dir,
+        }
 
-        await self.insert_forecasted_data(
-            input_dir=self.population_restorator_config.working_dirs.forecast_working_dir_path,
-            territory_id=territory_id,
-            year_begin=year_begin,
-            years=years,
-            scenario=scenario,
-        )
+        pipeline_config = self.population_restorator_config.pipeline
+        if not pipeline_config.enabled:
+            with progress.stage("forecast"):
+                await self.compute.run(prforecast, **forecast_kwargs)
+            progress.advance(years_counter, year_end - resume_year)
+            await self.insert_forecasted_data(
+                input_dir=forecast_working_dir,
+                territory_id=territory_id,
+                year_begin=resume_year,
+                years=year_end - resume_year,
+                scenario=scenario,
+                checkpoint=checkpoint,
+            )
+        else:
+            # every year is uploaded as soon as forecast moves on to the next one
+            pipeline = ForecastUploadPipeline(
+                saving_client=self.saving_client,
+                db_paths=self.get_forecast_db_paths(
+                    forecast_working_dir, territory_id, resume_year, year_end - resume_year, scenario
+                ),
+                territory_id=territory_id,
+                scenario=scenario,
+                queue_size=pipeline_config.queue_size,
+                poll_interval=pipeline_config.poll_interval,
+                verbose=self.debug,
+                checkpoint=checkpoint,
+            )
+            with progress.stage("forecast"):
+                await pipeline.run(self.compute.run(prforecast, **forecast_kwargs))
@@ -0,0 +1,104 @@
+"""
+UploadManifest is defined here
+it is used to remember which buildings forecast was uploaded for, so it could be deleted without reading output dbs
+and a failed or extended forecast could continue from the last completed year
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import structlog
+
+
+logger = structlog.getLogger()
+
+
+def read_house_ids(db_path: str) -> set[int]:
+    """
+    Returns: distinct house ids of forecast output db, only the house_id column index is read
+    """
+
+    with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+        return {row[0] for row in conn.execute("SELECT DISTINCT house_id FROM population_divided")}
+
+
+class UploadManifest:
+    """
+    This class keeps ids of buildings uploaded to saving api per forecasted year
+    in a small json file next to forecast output dbs.
+
+    Year ids are added before the upload and the year is marked completed after it,
+    so buildings of a partially uploaded year are known as well. `meta` describes the forecast
+    the uploaded years belong to (first year and divided db), years of another forecast can't be resumed.
+    """
+
+    filename = "uploaded.json"
+
+    def __init__(self, forecast_dir: str):
+        self.path = Path(forecast_dir) / self.filename
+
+    def _read(self) -> dict:
+        if not self.path.exists():
+            return {"meta": {}, "years": {}}
+        with open(self.path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if "years" not in data:
+            # manifest of the versions which kept only uploaded ids per year
+            return {"meta": {}, "years": {year: {"ids": ids, "completed": True} for year, ids in data.items()}}
+        return data
+
+    def _write(self, data: dict) -> None:
+        tmp_path = self.path.with_name(f".{self.filename}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def meta(self) -> dict:
+        return self._read()["meta"]
+
+    def load(self) -> dict[int, set[int]]:
+        """Returns: ids of buildings uploaded for every year, partially uploaded years included"""
+
+        return {int(year): set(entry["ids"]) for year, entry in self._read()["years"].items()}
+
+    def completed_years(self) -> set[int]:
+        return {int(year) for year, entry in self._read()["years"].items() if entry["completed"]}
+
+    def set_meta(self, **meta) -> None:
+        """Binds the manifest to another forecast, uploaded years are kept to be deleted but are not completed"""
+
+        data = self._read()
+        data["meta"] = meta
+        for entry in data["years"].values():
+            entry["completed"] = False
+        self._write(data)
+
+    def add(self, year: int, building_ids: set[int]) -> None:
+        """Adds buildings which are going to be uploaded for the year, the year is not completed until `complete`"""
+
+        data = self._read()
+        entry = data["years"].get(str(year), {"ids": [], "completed": False})
+        data["years"][str(year)] = {"ids": sorted(set(entry["ids"]) | building_ids), "completed": False}
+        self._write(data)
+
+    def complete(self, year: int) -> None:
+        data = self._read()
+        data["years"][str(year)]["completed"] = True
+        self._write(data)
+
+    def forget(self, years: set[int]) -> None:
+        """Removes years which uploaded data was deleted"""
+
+        if not self.path.exists():
+            return
+        data = self._read()
+        data["years"] = {year: entry for year, entry in data["years"].items() if int(year) not in years}
+        self._write(data)
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,138 @@
+"""
+JobWorkspace is defined here
+it is used to keep population_restorator working dbs of concurrent jobs apart
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import stat
+import time
+import typing as tp
+from pathlib import Path
+from uuid import uuid4
+
+import structlog
+from rq import get_current_job
+
+from app.http_clients.common.exceptions import ObjectNotFoundError
+from app.utils.config import WorkingDirConfig
+
+
+logger = structlog.getLogger()
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """Hard link keeps the file readable even after the published one is replaced, copy is used across devices"""
+
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class JobWorkspace:
+    """
+    This class gives every job its own directory under `jobs_dir_path`:
+    divide writes its db and forecast writes year dbs there, so jobs for the same territory never share files.
+
+    Divided db is published atomically with os.replace
+    to `divided_dbs_dir_path/terr_{territory_id}_year_{year}.sqlite`,
+    forecast year dbs are published to `forecast_working_dir_path/terr_{territory_id}_scen_{scenario}`
+    one by one as they are uploaded, see ForecastCheckpoint.
+
+    Job directory is removed on exit, failed ones are kept if `keep_failed_jobs` is set,
+    directories left by killed workers are removed after `stale_jobs_ttl` seconds.
+    """
+
+    def __init__(self, working_dirs: WorkingDirConfig, job_id: str | None = None):
+        if job_id is None:
+            job = get_current_job()
+            job_id = job.id if job is not None else "local"
+        self.working_dirs = working_dirs
+        # retried jobs keep their id, so every run gets its own directory
+        self.job_dir = Path(working_dirs.jobs_dir_path) / f"{job_id}-{uuid4().hex[:8]}"
+
+    def __enter__(self) -> JobWorkspace:
+        self.remove_stale_jobs()
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.cleanup(failed=exc_type is not None)
+
+    @property
+    def divide_db_path(self) -> str:
+        return str(self.job_dir / "divided.sqlite")
+
+    def forecast_dir(self, scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"]) -> str:
+        path = self.job_dir / f"forecast_{scenario}"
+        path.mkdir(parents=True, exist_ok=True)
+        # population_restorator joins working dir and db names as strings
+        return str(path) + os.sep
+
+    def scenario_db_path(self, scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"]) -> str:
+        """Private houses db of the scenario forecast, copied from the divided db or the resumed year db"""
+
+        return str(self.job_dir / f"houses_{scenario}.sqlite")
+
+    def published_divide_db_path(self, territory_id: int, year: int | None) -> Path:
+        return Path(self.working_dirs.divided_dbs_dir_path) / f"terr_{territory_id}_year_{year or 'latest'}.sqlite"
+
+    def published_forecast_dir(self, territory_id: int, scenario: tp.Literal["NEGATIVE", "NEUTRAL", "POSITIVE"]) -> str:
+        return str(Path(self.working_dirs.forecast_working_dir_path) / f"terr_{territory_id}_scen_{scenario}")
+
+    def publish_divide_db(self, territory_id: int, year: int | None) -> None:
+        """
+        Publishes divided db of the job, the job keeps its own copy for forecasting.
+
+        Published db is shared by hard links with the jobs using it, so it is made read-only
+        and anything writing to it fails loudly instead of changing the data of other jobs.
+        """
+
+        published = self.published_divide_db_path(territory_id, year)
+        published.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = published.with_name(f".{published.name}.{self.job_dir.name}")
+        os.chmod(self.divide_db_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        _link_or_copy(Path(self.divide_db_path), tmp_path)
+        os.replace(tmp_path, published)
+        logger.info(f"published divided db, path: {{{published}}}")
+
+    def use_published_divide_db(self, territory_id: int, year: int | None) -> None:
+        """
+        Makes the last published divided db of the territory the job one,
+        db for the given year is preferred over the one divided without start date
+        """
+
+        for candidate in (
+            self.published_divide_db_path(territory_id, year),
+            self.published_divide_db_path(territory_id, None),
+        ):
+            if candidate.exists():
+                _link_or_copy(candidate, Path(self.divide_db_path))
+                logger.info(f"using published divided db, path: {{{candidate}}}")
+                return
+        logger.error(f"no divided db is published for territory {territory_id}, year {year}")
+        raise ObjectNotFoundError()
+
+    def cleanup(self, failed: bool = False) -> None:
+        if failed and self.working_dirs.keep_failed_jobs:
+            logger.warning(f"job failed, working directory is kept: {{{self.job_dir}}}")
+            return
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def remove_stale_jobs(self) -> None:
+        """Removes directories of jobs which were not cleaned up, e.g. after worker was killed"""
+
+        jobs_dir = Path(self.working_dirs.jobs_dir_path)
+        if not jobs_dir.is_dir():
+            return
+        expired = time.time() - self.working_dirs.stale_jobs_ttl
+        for job_dir in jobs_dir.iterdir():
+            try:
+                if job_dir.is_dir() and job_dir.stat().st_mtime < expired:
+                    logger.info(f"removing stale job working directory: {{{job_dir}}}")
+                    shutil.rmtree(job_dir, ignore_errors=True)
+            except FileNotFoundError:
+                continue
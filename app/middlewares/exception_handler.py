@@ -1,25 +1,27 @@
 """Exception handling middleware is defined here."""
 
 import itertools
+import math
 import traceback
 
 import structlog
 from fastapi import Request
-from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.http_clients.common import (
     APIConnectionError,
     APITimeoutError,
+    CircuitOpenError,
     ObjectNotFoundError,
 )
 from app.schemas import (
     ErrorResponse,
     GatewayErrorResponse,
     JobErrorResponse,
+    ServiceUnavailableResponse,
     TimeoutErrorResponse,
 )
-from app.utils import JobError
+from app.utils import CircuitBreakerConfig, FastJSONResponse, JobError
 
 
 class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
@@ -42,12 +44,24 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
         try:
             return await call_next(request)
 
+        except CircuitOpenError as exc:
+            # errors of failed jobs are recreated without retry_after, default reset timeout is suggested then
+            retry_after = exc.retry_after if exc.retry_after is not None else CircuitBreakerConfig.reset_timeout
+            logger.error(f"status: 503, detail: {{content: Upstream server is considered down, info: {str(exc)}}}")
+            return FastJSONResponse(
+                content=ServiceUnavailableResponse(
+                    detail=f"Upstream server is considered down, info: {str(exc)}"
+                ).model_dump(),
+                status_code=503,
+                headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+            )
+
         except APIConnectionError as exc:
             logger.error(f"status: 502, detail: {{content: Couldn't connect to upstream server, info: { {str(exc)} }")
-            return JSONResponse(
+            return FastJSONResponse(
                 content=GatewayErrorResponse(
                     detail=f"Couldn't connect to upstream server, info: { {str(exc)} }"
-                ).dict(),
+                ).model_dump(),
                 status_code=502,
             )
 
@@ -55,10 +69,10 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
             logger.error(
                 f"status: 504, detail: {{content: Didn't receive a timely response from upstream server, info: {str(exc)}}}"
             )
-            return JSONResponse(
+            return FastJSONResponse(
                 content=TimeoutErrorResponse(
                     detail=f"Didn't receive a timely response from upstream server, info: {str(exc)}"
-                ),
+                ).model_dump(),
                 status_code=504,
             )
 
@@ -69,7 +83,9 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
                 f"therefore further calculations are impossible, "
                 f"info: {str(exc)}}}"
             )
-            return JSONResponse(content=f"couldn't find object or its data, detail: {{ {str(exc)} }}", status_code=404)
+            return FastJSONResponse(
+                content=f"couldn't find object or its data, detail: {{ {str(exc)} }}", status_code=404
+            )
 
         except JobError as exc:
             trace = exc.exc_info  # todo fix \n formatting
@@ -85,18 +101,18 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
             )
 
             if self._debug[0]:
-                return JSONResponse(
+                return FastJSONResponse(
                     content=JobErrorResponse(
                         job_id=exc.job_id,
                         error=str(exc.exc_value),
                         error_type=str(exc.exc_type),
                         path=request.url.query,
                         trace=trace,
-                    ).dict(),
+                    ).model_dump(),
                     status_code=502,
                 )
 
-            return JSONResponse(content=JobErrorResponse(job_id=exc.job_id).dict(), status_code=502)
+            return FastJSONResponse(content=JobErrorResponse(job_id=exc.job_id).model_dump(), status_code=502)
 
         except Exception as exc:  # pylint: disable=broad-except
             trace = list(
@@ -108,11 +124,11 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
             )
 
             if self._debug[0]:
-                return JSONResponse(
+                return FastJSONResponse(
                     content=ErrorResponse(
                         error=str(exc), error_type=str(type(exc)), path=request.url.path, trace=" ".join(trace)
-                    ).dict(),
+                    ).model_dump(),
                     status_code=500,
                 )
 
-            return JSONResponse(content=ErrorResponse().dict(), status_code=500)
+            return FastJSONResponse(content=ErrorResponse().model_dump(), status_code=500)
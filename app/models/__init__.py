@@ -1,2 +1,3 @@
 from .demographics import BirthStats, FertilityInterval, PopulationPyramid, SurvivabilityCoefficients
+from .forecasted_distribution import ForecastedDistribution
 from .urban_social_distribution import UrbanSocialDistribution
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Literal, get_args
+
+import numpy as np
+import pandas as pd
+
+
+Scenario = Literal["NEGATIVE", "NEUTRAL", "POSITIVE"]
+
+
+@dataclass
+class ForecastedDistribution:
+    """
+    This model is a columnar form of one year forecast output,
+    houses age-sex distribution in long format: one row per (building_id, sex, age).
+    Ranges are the same as UrbanSocialDistribution ones but validated for whole arrays at once,
+    rows are sent to saving_api as create-many dtos straight from arrays
+    """
+
+    scenario: Scenario
+    year: int
+    building_id: np.ndarray
+    sex: np.ndarray
+    age: np.ndarray
+    value: np.ndarray
+
+    def __post_init__(self):
+        self.validate()
+
+    @classmethod
+    def from_year_data(cls, year_data: pd.DataFrame, scenario: Scenario, year: int) -> ForecastedDistribution:
+        """
+        Args:
+            year_data: pd.DataFrame, forecast output of one year with house_id, age, men, women columns
+            scenario: Literal, scenario of the forecast
+            year: int, forecasted year
+        """
+
+        year_data = year_data[["house_id", "age", "men", "women"]].drop_duplicates()
+        rows = len(year_data)
+
+        return cls(
+            scenario=scenario,
+            year=year,
+            building_id=np.repeat(year_data["house_id"].to_numpy(), 2),
+            sex=np.tile(np.array(["MALE", "FEMALE"], dtype=object), rows),
+            age=np.repeat(year_data["age"].to_numpy(), 2),
+            value=year_data[["men", "women"]].to_numpy().ravel(),
+        )
+
+    def validate(self) -> None:
+        if self.scenario not in get_args(Scenario):
+            raise ValueError(f"Unknown scenario {self.scenario}")
+        if self.year < 1900:
+            raise ValueError(f"Year should be greater than or equal to 1900, got {self.year}")
+        if not len(self.building_id) == len(self.sex) == len(self.age) == len(self.value):
+            raise ValueError("Distribution columns have different lengths")
+
+        for name, column, lower, upper in (
+            ("building_id", self.building_id, 0, None),
+            ("age", self.age, 0, 100),
+            ("value", self.value, 0, None),
+        ):
+            if len(column) == 0:
+                continue
+            if not np.all(np.mod(column, 1) == 0):
+                raise ValueError(f"{name} values should be integers")
+            invalid = column < lower if upper is None else (column < lower) | (column > upper)
+            if invalid.any():
+                raise ValueError(
+                    f"{int(invalid.sum())} {name} values are out of [{lower}, {upper if upper is not None else 'inf'}]"
+                    f" range, year {self.year}"
+                )
+        if not np.isin(self.sex, ["MALE", "FEMALE"]).all():
+            raise ValueError("sex values should be MALE or FEMALE")
+
+        self.building_id = self.building_id.astype(np.int64)
+        self.age = self.age.astype(np.int64)
+        self.value = self.value.astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def building_ids(self) -> set[int]:
+        return set(np.unique(self.building_id).tolist())
+
+    def dtos(self, start: int = 0, stop: int | None = None) -> list[dict[str, Any]]:
+        """
+        Returns: rows [start, stop) as saving_api create-many dtos
+        """
+
+        return [
+            {
+                "building_id": building_id,
+                "scenario": self.scenario,
+                "year": self.year,
+                "sex": sex,
+                "age": age,
+                "value": value,
+            }
+            for building_id, sex, age, value in zip(
+                self.building_id[start:stop].tolist(),
+                self.sex[start:stop].tolist(),
+                self.age[start:stop].tolist(),
+                self.value[start:stop].tolist(),
+            )
+        ]
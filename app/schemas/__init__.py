@@ -2,14 +2,23 @@
 Response schemas are defined here.
 """
 
+from .cache import CacheInvalidatedResponse
 from .ping import PingResponse
+from .queues import QueueStatsResponse
 from .territories import (
+    BatchJobCreatedResponse,
+    BatchRestoreRequest,
+    CounterProgressResponse,
     ErrorResponse,
     GatewayErrorResponse,
     JobCreatedResponse,
     JobErrorResponse,
     JobNotFoundErrorResponse,
+    JobProgressResponse,
     JobResponse,
+    ServiceUnavailableResponse,
+    StageProgressResponse,
+    TerritoryJobsResponse,
     TerritoryResponse,
     TimeoutErrorResponse,
     UrbanSocialDistributionPost,
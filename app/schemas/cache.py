@@ -0,0 +1,9 @@
+"""
+Response cache models are defined here
+"""
+
+from pydantic import BaseModel, Field
+
+
+class CacheInvalidatedResponse(BaseModel):
+    deleted: int = Field(..., description="amount of deleted cache entries", examples=[12])
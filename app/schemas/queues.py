@@ -0,0 +1,15 @@
+"""
+Job queues statistics models are defined here
+"""
+
+from pydantic import BaseModel, Field
+
+
+class QueueStatsResponse(BaseModel):
+    name: str = Field(..., examples=["restore:bulk"])
+    priority: str = Field(..., examples=["bulk"])
+    queued: int = Field(..., description="amount of jobs waiting in the queue")
+    started: int = Field(..., description="amount of running jobs")
+    deferred: int = Field(..., description="amount of jobs waiting for other jobs to finish")
+    oldest_wait: float = Field(..., description="seconds the first queued job waits")
+    started_wait: float = Field(..., description="mean seconds running jobs waited in the queue")
@@ -30,21 +30,70 @@ class JobErrorResponse(BaseModel):
     trace: Optional[str] = None
 
 
+class StageProgressResponse(BaseModel):
+    started_at: str
+    finished_at: Optional[str] = Field(None, description="time the stage was last finished, None while running")
+    duration: float = Field(..., description="seconds spent in the stage, concurrent runs are summed")
+
+
+class CounterProgressResponse(BaseModel):
+    done: int
+    total: Optional[int] = None
+    eta: Optional[float] = Field(None, description="estimated seconds left")
+    year: Optional[int] = None
+
+
+class JobProgressResponse(BaseModel):
+    stage: Optional[str] = Field(None, description="stage being run", examples=["forecast"])
+    stages: dict[str, StageProgressResponse] = Field(default_factory=dict)
+    counters: dict[str, CounterProgressResponse] = Field(
+        default_factory=dict, description="progress counters, e.g. forecast_years:NEUTRAL, upload_rows:NEUTRAL"
+    )
+
+
 class JobResponse(BaseModel):
     job_id: str
     status: str
     result: Optional[TerritoryResponse]
+    progress: Optional[JobProgressResponse] = None
 
 
 class JobCreatedResponse(BaseModel):
     job_id: str
     status: str
+    coalesced: bool = Field(False, description="identical job was queued or running already, its id is returned")
+
+
+class BatchRestoreRequest(BaseModel):
+    territories_ids: list[int] = Field(..., min_length=1, description="territories to be forecasted")
+    year_begin: int = Field(..., ge=1900)
+    year_end: int = Field(..., ge=1900)
+    scenarios: list[Literal["NEGATIVE", "NEUTRAL", "POSITIVE"]] = Field(
+        default_factory=lambda: ["NEGATIVE", "NEUTRAL", "POSITIVE"], min_length=1
+    )
+    priority: Optional[str] = Field(None, description="priority class of the jobs, interactive or bulk by default")
+    force: bool = Field(False, description="enqueue jobs even if identical ones are queued or running")
+
+
+class TerritoryJobsResponse(BaseModel):
+    territory_id: int
+    divide_job_id: str
+    restore_jobs_ids: dict[str, str] = Field(..., description="restore job id by scenario")
+
+
+class BatchJobCreatedResponse(BaseModel):
+    status: str
+    territories: list[TerritoryJobsResponse]
 
 
 class GatewayErrorResponse(BaseModel):
     detail: str = "did not get a response from the upstream server in order to complete the request"
 
 
+class ServiceUnavailableResponse(BaseModel):
+    detail: str = "upstream server is considered down, the request should be retried later"
+
+
 class TimeoutErrorResponse(BaseModel):
     detail: str = "did not get a response in time from the upstream server in order to complete the request"
 
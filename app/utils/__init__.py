@@ -3,16 +3,37 @@
 from .config import (
     ApiConfig,
     AppConfig,
+    BulkRequestsConfig,
+    CircuitBreakerConfig,
+    CompressionConfig,
+    ComputeConfig,
+    ConnectionPoolConfig,
     FileLogger,
+    ForecastPipelineConfig,
     LoggingConfig,
     PopulationRestoratorApiConfig,
     RedisQueueConfig,
+    ResultStoreConfig,
+    RetryConfig,
     WorkingDirConfig,
 )
 from .dotenv import try_load_envfile
+from .job_events import TERMINAL_JOB_EVENTS, JobEventsHub, publish_job_event
 from .logging import configure_logging
+from .metrics import JobsCollector, render_metrics
+from .progress import JobProgress, job_progress
 from .redis_client import (
+    DependencyFailedError,
+    DependentJob,
     JobError,
+    enqueue_unique,
+    fetch_job,
+    is_job_active,
+    job_key,
     start_redis_queue,
+    start_redis_queues,
     start_rq_worker,
 )
+from .scheduling import JobScheduler, QueueStats
+from .serialization import FastJSONResponse
+from .workers import WorkerSupervisor
@@ -6,7 +6,7 @@ import os
 from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, TextIO
+from typing import Any, Literal, TextIO
 
 import yaml
 
@@ -29,17 +29,161 @@ class AppConfig:
 
 @dataclass
 class WorkingDirConfig:
-    divide_working_db_path: str
+    """
+    jobs work in their own `jobs_dir_path` subdirectories, results are published to
+    `divided_dbs_dir_path` and `forecast_working_dir_path`, failed jobs directories can be kept for debugging
+    """
+
+    divided_dbs_dir_path: str
     forecast_working_dir_path: str
+    jobs_dir_path: str = "./jobs/"
+    keep_failed_jobs: bool = False
+    stale_jobs_ttl: int = 24 * 60 * 60
+
+
+@dataclass
+class ForecastPipelineConfig:
+    """uploading forecast output year by year while forecasting is running"""
+
+    enabled: bool = True
+    queue_size: int = 1
+    poll_interval: float = 1.0
+
+
+@dataclass
+class ComputeConfig:
+    """
+    process pool for population_restorator balance/divide/forecast calls, 0 workers runs them in a thread,
+    restore with several scenarios forecasts up to `max_workers` of them at once
+    """
+
+    max_workers: int = 3
+    start_method: str = "spawn"
+
+
+@dataclass
+class ResultStoreConfig:
+    """
+    storage of balance/divide job results as arrow files, `local` directory should be shared by api and workers,
+    `redis` uses redis_queue connection, `uncompressed` local files are memory-mapped without copying
+    """
+
+    backend: Literal["local", "redis"] = "local"
+    path: str = "./results/"
+    compression: Literal["zstd", "lz4", "uncompressed"] = "zstd"
+    ttl: int = 7 * 24 * 60 * 60
 
 
 @dataclass
 class RedisQueueConfig:
-    # todo desc
+    """
+    redis connection and rq workers settings,
+    jobs are put to queues by their type (balance/divide/restore), not mapped types go to `queue_name`,
+    `workers` processes are spawned with api, 0 if workers are run standalone.
+
+    Every queue is split by priority classes, `priorities` are listed from the highest one,
+    workers take jobs from higher priority queues first, `reserved_workers` of them listen only to the highest
+    priority queues, so long bulk jobs can't occupy all workers (at least one worker listens to all queues).
+    Territory could have `territory_jobs_limit` jobs running at once, the following ones wait for them, 0 to disable.
+    The limit is shared by all priorities, so interactive jobs of a territory may wait for its bulk ones
+    """
+
     host: str
     port: str
     db: int
     queue_name: str
+    workers: int = 1
+    job_queues: dict[str, str] = field(
+        default_factory=lambda: {"balance": "balance", "divide": "divide", "restore": "restore"}
+    )
+    priorities: list[str] = field(default_factory=lambda: ["interactive", "bulk"])
+    job_priorities: dict[str, str] = field(
+        default_factory=lambda: {"balance": "interactive", "divide": "interactive", "restore": "bulk"}
+    )
+    reserved_workers: int = 1
+    territory_jobs_limit: int = 2
+    shutdown_timeout: float = 60.0
+    check_interval: float = 5.0
+
+    def priority_for(self, job_type: str) -> str:
+        return self.job_priorities.get(job_type, self.priorities[-1])
+
+    def queue_for(self, job_type: str, priority: str | None = None) -> str:
+        return f"{self.job_queues.get(job_type, self.queue_name)}:{priority or self.priority_for(job_type)}"
+
+    def priority_queue_names(self, priority: str) -> list[str]:
+        return [f"{name}:{priority}" for name in dict.fromkeys([*self.job_queues.values(), self.queue_name])]
+
+    @property
+    def queue_names(self) -> list[str]:
+        """Returns: names of all queues, from the highest priority to the lowest one"""
+
+        return [name for priority in self.priorities for name in self.priority_queue_names(priority)]
+
+
+@dataclass
+class ConnectionPoolConfig:
+    """aiohttp connector settings of the client's long-lived session"""
+
+    limit: int = 100
+    limit_per_host: int = 20
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: int = 300
+
+
+@dataclass
+class BulkRequestsConfig:
+    """
+    create-many/delete-many requests settings: ids or rows per request, requests sent at once,
+    failed chunks are retried `retries` times with exponentially growing `retry_delay`.
+    With `adaptive` uploads start with upload_* values and tune them by latency and errors
+    (see AIMDController) within min_upload_* and max_upload_* bounds
+    """
+
+    upload_chunk_size: int = 1000
+    upload_concurrency: int = 10
+    delete_chunk_size: int = 5000
+    delete_concurrency: int = 4
+    retries: int = 3
+    retry_delay: float = 1.0
+    adaptive: bool = True
+    min_upload_chunk_size: int = 100
+    max_upload_chunk_size: int = 5000
+    upload_chunk_step: int = 100
+    min_upload_concurrency: int = 1
+    max_upload_concurrency: int = 32
+    target_latency: float = 2.0
+    decrease_factor: float = 0.5
+
+
+@dataclass
+class RetryConfig:
+    """retries of idempotent calls failed with connection errors, timeouts, 429 or 5xx, delays are jittered"""
+
+    attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 10.0
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """calls fail fast for `reset_timeout` seconds after `failure_threshold` consecutive upstream failures"""
+
+    enabled: bool = True
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+
+@dataclass
+class CompressionConfig:
+    """
+    `request_encoding` ("gzip"/"br", null to disable) compresses POST/DELETE json bodies of at least `min_size` bytes,
+    `accept_encoding` is sent with GET requests, br is used only with `brotli` package installed
+    """
+
+    request_encoding: Literal["gzip", "br"] | None = None
+    min_size: int = 1024
+    accept_encoding: str | None = "gzip, deflate, br"
 
 
 @dataclass
@@ -50,6 +194,24 @@ class ApiConfig:
     port: int
     api_key: str | None
     const_request_params: dict[str, Any] = field(default_factory=dict)
+    connection_pool: ConnectionPoolConfig = field(default_factory=ConnectionPoolConfig)
+    cache_ttl: dict[str, int] = field(default_factory=dict)
+    bulk: BulkRequestsConfig = field(default_factory=BulkRequestsConfig)
+    retry: RetryConfig = field(default_factory=RetryConfig)
+    circuit_breaker: CircuitBreakerConfig = field(default_factory=CircuitBreakerConfig)
+    compression: CompressionConfig = field(default_factory=CompressionConfig)
+
+    def __post_init__(self):
+        if isinstance(self.connection_pool, dict):
+            self.connection_pool = ConnectionPoolConfig(**self.connection_pool)
+        if isinstance(self.bulk, dict):
+            self.bulk = BulkRequestsConfig(**self.bulk)
+        if isinstance(self.retry, dict):
+            self.retry = RetryConfig(**self.retry)
+        if isinstance(self.circuit_breaker, dict):
+            self.circuit_breaker = CircuitBreakerConfig(**self.circuit_breaker)
+        if isinstance(self.compression, dict):
+            self.compression = CompressionConfig(**self.compression)
 
 
 @dataclass
@@ -84,6 +246,9 @@ class LoggingConfig:
 class PopulationRestoratorConfig:
     working_dirs: WorkingDirConfig
     fertility_interval: FertilityInterval
+    pipeline: ForecastPipelineConfig = field(default_factory=ForecastPipelineConfig)
+    compute: ComputeConfig = field(default_factory=ComputeConfig)
+    results: ResultStoreConfig = field(default_factory=ResultStoreConfig)
 
 
 @dataclass
@@ -152,7 +317,7 @@ class PopulationRestoratorApiConfig:
             app=AppConfig(host="0.0.0.0", port=8000, debug=True, name="population-restorator-api"),
             population_restorator=PopulationRestoratorConfig(
                 working_dirs=WorkingDirConfig(
-                    divide_working_db_path="./test.db",
+                    divided_dbs_dir_path="./divided_dbs/",
                     forecast_working_dir_path="./calculation_dbs/",
                 ),
                 fertility_interval=FertilityInterval(start=18, end=40),
@@ -188,6 +353,9 @@ class PopulationRestoratorApiConfig:
                     fertility_interval=FertilityInterval(
                         **population_restorator["fertility"],
                     ),
+                    pipeline=ForecastPipelineConfig(**population_restorator.get("pipeline", {})),
+                    compute=ComputeConfig(**population_restorator.get("compute", {})),
+                    results=ResultStoreConfig(**population_restorator.get("results", {})),
                 ),
                 redis_queue=RedisQueueConfig(**data.get("redis_queue", {})),
                 logging=LoggingConfig(**data.get("logging", {})),
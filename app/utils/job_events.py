@@ -0,0 +1,123 @@
+"""
+Job events publishing and JobEventsHub are defined here
+workers publish progress and completion of jobs to redis pub/sub, api streams them to clients
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import structlog
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from rq.job import Job
+from rq.utils import now
+
+from .metrics import observe_job
+from .serialization import dumps, loads
+
+
+logger = structlog.getLogger()
+
+JOB_EVENTS_CHANNEL_PREFIX = "population_restorator_api:job_events:"
+
+TERMINAL_JOB_EVENTS = ("finished", "failed")
+
+
+def publish_job_event(connection: Redis, job_id: str, event: str, **data: Any) -> None:
+    """
+    Publishes job event ("progress", "finished" or "failed") with its data,
+    events are not kept, clients get the current state from the job itself when they subscribe
+    """
+
+    try:
+        connection.publish(f"{JOB_EVENTS_CHANNEL_PREFIX}{job_id}", dumps({"job_id": job_id, "event": event, **data}))
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning(f"could not publish job event: {exc!r}")
+
+
+def on_job_success(job: Job, connection: Redis, result: Any, *args, **kwargs) -> None:
+    """rq success callback, the job status is set to finished right after it"""
+
+    observe_job(job, "finished")
+    publish_job_event(
+        connection, job.id, "finished", status="finished", performed_at=str(now()), progress=job.meta.get("progress")
+    )
+
+
+def on_job_failure(job: Job, connection: Redis, exc_type: type, exc_value: BaseException, traceback) -> None:
+    """rq failure callback, the job status is set to failed right after it"""
+
+    observe_job(job, "failed")
+    publish_job_event(
+        connection,
+        job.id,
+        "failed",
+        status="failed",
+        error=str(exc_value),
+        error_type=exc_type.__name__,
+        progress=job.meta.get("progress"),
+    )
+
+
+class JobEventsHub:
+    """
+    This class keeps one redis pub/sub connection per api process subscribed to events of all jobs
+    and dispatches them to local subscribers, so streaming clients don't load redis.
+    Connection is restored after `reconnect_delay` seconds if it is lost, events published meanwhile are missed
+    """
+
+    def __init__(self, host: str, port: int, db: int, reconnect_delay: float = 1.0):
+        self.redis = AsyncRedis(host=host, port=port, db=db)
+        self.reconnect_delay = reconnect_delay
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.redis.aclose()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{JOB_EVENTS_CHANNEL_PREFIX}*")
+                    async for message in pubsub.listen():
+                        if message["type"] == "pmessage":
+                            self._dispatch(message["channel"].decode(), message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error(f"job events subscription is lost: {exc!r}, reconnecting in {self.reconnect_delay}s")
+                await asyncio.sleep(self.reconnect_delay)
+
+    def _dispatch(self, channel: str, data: bytes) -> None:
+        job_id = channel[len(JOB_EVENTS_CHANNEL_PREFIX) :]
+        subscribers = self._subscribers.get(job_id)
+        if not subscribers:
+            return
+        event = loads(data)
+        for queue in subscribers:
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Yields queue which gets events of the job until the context is exited"""
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[job_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[job_id].discard(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
@@ -0,0 +1,134 @@
+"""
+Prometheus metrics are defined here
+
+Metrics of api, rq workers and jobs processes are collected in one place if PROMETHEUS_MULTIPROC_DIR
+environment variable is set to the directory shared by them (it should be emptied before the start),
+queues and workers metrics are read from redis when metrics are scraped
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import typing as tp
+from urllib.parse import urlsplit
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from rq import Worker
+from rq.job import Job
+from rq.utils import now
+
+
+if tp.TYPE_CHECKING:
+    from .scheduling import JobScheduler
+
+
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "population_restorator_api_upstream_request_duration_seconds",
+    "Upstream API requests duration",
+    ["client", "method", "endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+UPSTREAM_REQUESTS = Counter(
+    "population_restorator_api_upstream_requests",
+    "Upstream API requests by response status, error for requests failed without response",
+    ["client", "method", "endpoint", "status"],
+)
+UPSTREAM_BYTES = Counter(
+    "population_restorator_api_upstream_bytes",
+    "Decoded bytes of upstream API request (sent) and response (received) bodies,"
+    " encoding is Content-Encoding they were transferred with",
+    ["client", "method", "endpoint", "direction", "encoding"],
+)
+UPSTREAM_RETRIES = Counter(
+    "population_restorator_api_upstream_retries",
+    "Retried upstream API calls and chunks of bulk requests",
+    ["client", "operation"],
+)
+JOB_STAGE_DURATION = Histogram(
+    "population_restorator_api_job_stage_duration_seconds",
+    "Duration of job stages: fetch, balance, divide, delete, forecast, upload",
+    ["stage"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 9000),
+)
+JOB_DURATION = Histogram(
+    "population_restorator_api_job_duration_seconds",
+    "Duration of jobs by job function and result",
+    ["job", "status"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 9000),
+)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_label(url: str) -> str:
+    """Returns: url path with numeric segments replaced by {id}, so every territory doesn't get own series"""
+
+    return _ID_SEGMENT.sub("/{id}", urlsplit(url).path) or "/"
+
+
+def observe_job(job: Job, status: str) -> None:
+    if job.started_at is not None:
+        JOB_DURATION.labels(job.func_name.rsplit(".", 1)[-1], status).observe((now() - job.started_at).total_seconds())
+
+
+class JobsCollector:
+    """Collects queues depth and wait times and rq workers utilization from redis on scrape"""
+
+    def __init__(self, scheduler: JobScheduler):
+        self.scheduler = scheduler
+
+    def collect(self):
+        jobs = GaugeMetricFamily(
+            "population_restorator_api_queue_jobs", "Jobs in queue by state", labels=["queue", "priority", "state"]
+        )
+        oldest_wait = GaugeMetricFamily(
+            "population_restorator_api_queue_oldest_wait_seconds",
+            "How long the first queued job waits",
+            labels=["queue", "priority"],
+        )
+        started_wait = GaugeMetricFamily(
+            "population_restorator_api_queue_started_wait_seconds",
+            "Mean time running jobs waited in queue",
+            labels=["queue", "priority"],
+        )
+        for stats in self.scheduler.stats():
+            for state in ("queued", "started", "deferred"):
+                jobs.add_metric([stats.name, stats.priority, state], getattr(stats, state))
+            oldest_wait.add_metric([stats.name, stats.priority], stats.oldest_wait)
+            started_wait.add_metric([stats.name, stats.priority], stats.started_wait)
+
+        workers = GaugeMetricFamily("population_restorator_api_workers", "rq workers by state", labels=["state"])
+        working_time = CounterMetricFamily(
+            "population_restorator_api_workers_working_seconds",
+            "Time rq workers spent running jobs, its rate divided by workers amount is utilization",
+        )
+        states: dict[str, int] = {}
+        total_working_time = 0.0
+        for worker in Worker.all(connection=self.scheduler.redis):
+            state = worker.get_state()
+            states[state] = states.get(state, 0) + 1
+            total_working_time += worker.total_working_time
+        for state, count in states.items():
+            workers.add_metric([state], count)
+        working_time.add_metric([], total_working_time)
+
+        yield from (jobs, oldest_wait, started_wait, workers, working_time)
+
+
+def render_metrics(jobs_collector: JobsCollector | None = None) -> bytes:
+    """Returns: metrics of all processes in prometheus text format"""
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    output = generate_latest(registry)
+
+    if jobs_collector is not None:
+        jobs_registry = CollectorRegistry()
+        jobs_registry.register(jobs_collector)
+        output += generate_latest(jobs_registry)
+    return output
@@ -0,0 +1,109 @@
+"""
+JobProgress is defined here
+it is used to report what the running rq job is doing to its meta, so status endpoint could show it
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import structlog
+from rq import get_current_job
+from rq.job import Job
+from rq.utils import now
+
+from .job_events import publish_job_event
+from .metrics import JOB_STAGE_DURATION
+
+
+logger = structlog.getLogger()
+
+
+class JobProgress:
+    """
+    This class keeps progress of the rq job in `job.meta["progress"]`:
+    the running stage, start time and duration of every stage (durations of concurrent runs are summed)
+    and done/total counters (forecasted years, uploaded rows...) with estimated seconds left.
+
+    Stages are saved at once, counters at most every `save_interval` seconds, every save is published as job event.
+    Progress is only kept in memory outside of rq job.
+    """
+
+    meta_key = "progress"
+
+    def __init__(self, job: Job | None, save_interval: float = 1.0):
+        self.job = job
+        self.save_interval = save_interval
+        self.data: dict[str, Any] = {"stage": None, "stages": {}, "counters": {}}
+        self._active_stages: list[str] = []
+        self._counters_started: dict[str, tuple[float, int]] = {}
+        self._saved_at = 0.0
+
+    @property
+    def job_id(self) -> str | None:
+        return self.job.id if self.job is not None else None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        began = time.monotonic()
+        entry = self.data["stages"].setdefault(name, {"started_at": str(now()), "finished_at": None, "duration": 0.0})
+        self._active_stages.append(name)
+        self.data["stage"] = name
+        self.save(force=True)
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - began
+            JOB_STAGE_DURATION.labels(name).observe(elapsed)
+            entry["duration"] += elapsed
+            entry["finished_at"] = str(now())
+            self._active_stages.remove(name)
+            self.data["stage"] = self._active_stages[-1] if self._active_stages else None
+            self.save(force=True)
+
+    def start_counter(self, name: str, total: int | None, done: int = 0, **details: Any) -> None:
+        """Starts (or restarts) the counter, details (e.g. year) are reported with it"""
+
+        self._counters_started[name] = (time.monotonic(), done)
+        self.data["counters"][name] = {"done": done, "total": total, "eta": None, **details}
+        self.save()
+
+    def advance(self, name: str, amount: int = 1) -> None:
+        counter = self.data["counters"].setdefault(name, {"done": 0, "total": None, "eta": None})
+        started_at, started_done = self._counters_started.setdefault(name, (time.monotonic(), counter["done"]))
+        counter["done"] += amount
+        if counter["total"] is not None and counter["done"] > started_done:
+            rate = (counter["done"] - started_done) / max(time.monotonic() - started_at, 1e-6)
+            counter["eta"] = round(max(counter["total"] - counter["done"], 0) / rate, 1)
+        self.save(force=counter["done"] == counter["total"])
+
+    def save(self, force: bool = False) -> None:
+        if self.job is None or (not force and time.monotonic() - self._saved_at < self.save_interval):
+            return
+        self._saved_at = time.monotonic()
+        self.job.meta[self.meta_key] = self.data
+        try:
+            self.job.save_meta()
+        except Exception as exc:  # pylint: disable=broad-except
+            # progress is informational, the job goes on without it
+            logger.warning(f"could not save job progress: {exc!r}")
+            return
+        publish_job_event(self.job.connection, self.job.id, "progress", status="started", progress=self.data)
+
+
+_progress: JobProgress | None = None
+
+
+def job_progress() -> JobProgress:
+    """Returns: progress of the current rq job, the new one is made when another job starts in the process"""
+
+    global _progress  # pylint: disable=global-statement
+
+    job = get_current_job()
+    job_id = job.id if job is not None else None
+    if _progress is None or _progress.job_id != job_id:
+        _progress = JobProgress(job)
+    return _progress
@@ -1,5 +1,20 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Callable, Iterable
+from typing import Any
+
 from redis import Redis
 from rq import Queue, Worker
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+
+
+ACTIVE_JOB_STATUSES = (JobStatus.QUEUED, JobStatus.STARTED, JobStatus.DEFERRED, JobStatus.SCHEDULED)
+
+# identical submissions are coalesced onto the last job of their key for a week at most
+JOB_KEY_TTL = 7 * 24 * 3600
 
 
 class JobError(RuntimeError):
@@ -16,6 +31,38 @@ class JobError(RuntimeError):
         self.exc_info = exc_info
 
 
+class DependencyFailedError(RuntimeError):
+    """Job required by the one to be run has failed, so the latter is failed without running"""
+
+
+class DependentJob(Job):
+    """
+    Job which is failed with DependencyFailedError instead of being run if any of jobs it requires
+    (ids in `meta["requires"]`) has not finished.
+    Jobs depend on the required ones with allow_failure, so rq runs them after the required ones fail too
+    and failures are passed down the jobs graph instead of leaving dependents deferred forever
+    """
+
+    requires_meta_key = "requires"
+
+    def unfinished_requirements(self) -> list[str]:
+        """Returns: ids of required jobs which are not finished"""
+
+        required_ids = self.meta.get(self.requires_meta_key, [])
+        with self.connection.pipeline() as pipeline:
+            for job_id in required_ids:
+                pipeline.hget(self.key_for(job_id), "status")
+            statuses = pipeline.execute()
+        return [
+            job_id for job_id, job_status in zip(required_ids, statuses) if job_status != JobStatus.FINISHED.encode()
+        ]
+
+    def perform(self) -> Any:
+        if unfinished := self.unfinished_requirements():
+            raise DependencyFailedError(f"Required jobs have failed: {', '.join(unfinished)}")
+        return super().perform()
+
+
 def job_exception_handler(job, exc_type, exc_value, traceback):
     job.meta["exc_type"] = {"exc_type": exc_type}
     job.meta["exc_value"] = {"exc_value": exc_value}
@@ -28,8 +75,87 @@ def start_redis_queue(host: str, port: int, db: int):
     return (redis_conn, queue)
 
 
-def start_rq_worker(host: str, port: int, db: int, queue_name: str):
+def start_redis_queues(host: str, port: int, db: int, queue_names: Iterable[str]) -> tuple[Redis, dict[str, Queue]]:
+    redis_conn = Redis(host=host, port=port, db=db)
+    queues = {queue_name: Queue(queue_name, connection=redis_conn) for queue_name in queue_names}
+    return (redis_conn, queues)
+
+
+def fetch_job(redis_conn: Redis, job_id: str) -> Job | None:
+    """Returns job from any queue by its id or None"""
+    try:
+        return Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        return None
+
+
+def is_job_active(job: Job) -> bool:
+    """
+    Returns: whether the job is queued, running or is going to be run.
+    Deferred job is never run if any of its dependencies was canceled or stopped, is never run itself
+    or has failed while the job doesn't allow failures, rq doesn't expire such jobs
+    """
+
+    job_status = job.get_status()
+    if job_status not in ACTIVE_JOB_STATUSES:
+        return False
+    if job_status != JobStatus.DEFERRED:
+        return True
+    # missing dependencies are the finished ones with expired results
+    for dependency in filter(None, Job.fetch_many(job.dependency_ids, connection=job.connection)):
+        dependency_status = dependency.get_status()
+        if dependency_status in (JobStatus.CANCELED, JobStatus.STOPPED):
+            return False
+        if dependency_status == JobStatus.FAILED and not job.allow_dependency_failures:
+            return False
+        if dependency_status == JobStatus.DEFERRED and not is_job_active(dependency):
+            return False
+    return True
+
+
+def job_key(endpoint: str, **params: Any) -> str:
+    """
+    Returns: deterministic key of the endpoint called with given params, see `enqueue_unique`,
+    params are hashed in sorted order, values which are not json types are hashed by str
+    """
+
+    payload = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+    return f"{endpoint}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]}"
+
+
+def enqueue_unique(queue: Queue, key: str, func: Callable, *args, force: bool = False, **kwargs) -> tuple[Job, bool]:
+    """
+    Enqueues job unless the last job enqueued with the same `key` is queued, deferred or running already,
+    identical submissions are coalesced onto it then. `force` enqueues the job anyway.
+    Jobs get their own ids, so results of finished ones are never overwritten by the identical submissions,
+    the key points to the last job for `JOB_KEY_TTL` seconds
+    Args:
+        queue: Queue, queue to enqueue job to
+        key: str, key of identical submissions, see `job_key`
+        func: Callable, job function, args and kwargs are passed to Queue.enqueue
+        force: bool, don't coalesce onto the active job
+    Returns: job and whether it was enqueued
+    """
+
+    connection = queue.connection
+    pointer_key = f"population_restorator_api:job_key:{key}"
+    # lock keeps concurrent identical submissions from enqueueing the job twice
+    with connection.lock(f"population_restorator_api:enqueue:{key}", timeout=30, blocking_timeout=30):
+        job_id = connection.get(pointer_key)
+        job = fetch_job(connection, job_id.decode()) if job_id is not None else None
+        if not force and job is not None and is_job_active(job):
+            return job, False
+        job = queue.enqueue(func, *args, **kwargs)
+        connection.set(pointer_key, job.id, ex=JOB_KEY_TTL)
+        return job, True
+
+
+def start_rq_worker(host: str, port: int, db: int, queue_names: str | Iterable[str]):
     connection = Redis(host=host, port=port, db=db)
-    queue = Queue(queue_name, connection)
-    worker = Worker(queues=[queue], connection=connection, exception_handlers=[job_exception_handler])
+    if isinstance(queue_names, str):
+        queue_names = [queue_names]
+    queues = [Queue(queue_name, connection=connection) for queue_name in queue_names]
+    worker = Worker(
+        queues=queues, connection=connection, exception_handlers=[job_exception_handler], job_class=DependentJob
+    )
     worker.work()
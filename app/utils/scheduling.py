@@ -0,0 +1,173 @@
+"""
+JobScheduler is defined here
+it is used to put jobs to priority queues and keep territories from occupying all workers
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import structlog
+from redis import Redis
+from rq import Callback, Queue
+from rq.job import Dependency, Job
+from rq.registry import DeferredJobRegistry, StartedJobRegistry
+from rq.utils import now
+
+from .config import RedisQueueConfig
+from .job_events import on_job_failure, on_job_success
+from .redis_client import DependentJob, enqueue_unique, is_job_active
+
+
+logger = structlog.getLogger()
+
+
+@dataclass(frozen=True)
+class QueueStats:
+    """
+    `oldest_wait` is how long the first queued job waits, `started_wait` is the mean time
+    running jobs have waited before they started, both in seconds
+    """
+
+    name: str
+    priority: str
+    queued: int
+    started: int
+    deferred: int
+    oldest_wait: float
+    started_wait: float
+
+
+class JobScheduler:
+    """
+    This class puts jobs to queues by their type and priority class, see RedisQueueConfig.
+
+    Every territory could have `territory_jobs_limit` active (queued, deferred or running) jobs
+    without waiting, the next one depends on the job enqueued `territory_jobs_limit` jobs before it
+    along with the jobs it requires, so one territory never runs more jobs at once
+    and the other territories' jobs are taken by free workers.
+    Priorities are not taken into account here: interactive job of the territory running `territory_jobs_limit`
+    bulk restores waits for one of them, priorities only order jobs which are ready to run.
+    Jobs publish their completion as job events
+    """
+
+    territory_jobs_key = "population_restorator_api:territory_jobs:{territory_id}"
+
+    def __init__(self, redis_conn: Redis, queues: dict[str, Queue], config: RedisQueueConfig):
+        self.redis = redis_conn
+        self.queues = queues
+        self.config = config
+
+    def queue(self, job_type: str, priority: str | None = None) -> Queue:
+        if priority is not None and priority not in self.config.priorities:
+            raise ValueError(f"Unknown priority: {priority}, expected one of {self.config.priorities}")
+        return self.queues[self.config.queue_for(job_type, priority)]
+
+    def active_territory_jobs(self, territory_id: int) -> list[Job]:
+        """Returns: active jobs of the territory in the order they were enqueued, finished ones are forgotten"""
+
+        key = self.territory_jobs_key.format(territory_id=territory_id)
+        jobs_ids = [job_id.decode() for job_id in self.redis.zrange(key, 0, -1)]
+        jobs = Job.fetch_many(jobs_ids, connection=self.redis)
+        active = [job for job in jobs if job is not None and is_job_active(job)]
+        if inactive_ids := set(jobs_ids) - {job.id for job in active}:
+            self.redis.zrem(key, *inactive_ids)
+        return active
+
+    def enqueue(
+        self,
+        job_type: str,
+        key: str,
+        func: Callable,
+        *args,
+        territory_id: int | None = None,
+        priority: str | None = None,
+        force: bool = False,
+        requires: list[Job] | None = None,
+        **kwargs,
+    ) -> tuple[Job, bool]:
+        """
+        Args:
+            job_type: str, balance/divide/restore, defines job queue and its default priority
+            key: str, key identical submissions are coalesced by, see `enqueue_unique`
+            func: Callable, job function, args and kwargs are passed to Queue.enqueue
+            territory_id: int | None, territory the job is limited by
+            priority: str | None, priority class from RedisQueueConfig.priorities to override the default one
+            force: bool, don't coalesce onto the active identical job
+            requires: list[Job] | None, jobs the job is run after, it fails with DependencyFailedError
+                if any of them fails, see DependentJob
+        Returns: job and whether it was enqueued
+        """
+
+        if "depends_on" in kwargs:
+            raise TypeError("JobScheduler sets job dependencies itself, required jobs are given by `requires`")
+        queue = self.queue(job_type, priority)
+        kwargs.setdefault("on_success", Callback(on_job_success))
+        kwargs.setdefault("on_failure", Callback(on_job_failure))
+        dependencies = {job.id: job for job in requires or []}
+        if requires:
+            kwargs["meta"] = kwargs.get("meta", {}) | {DependentJob.requires_meta_key: list(dependencies)}
+        limit = self.config.territory_jobs_limit
+        if territory_id is None or limit <= 0:
+            if dependencies:
+                kwargs["depends_on"] = Dependency(jobs=list(dependencies.values()), allow_failure=True)
+            return enqueue_unique(queue, key, func, *args, force=force, **kwargs)
+
+        territory_jobs_key = self.territory_jobs_key.format(territory_id=territory_id)
+        # lock keeps concurrent submissions for the territory from taking the same place in its jobs order
+        with self.redis.lock(f"{territory_jobs_key}:lock", timeout=30, blocking_timeout=30):
+            active = self.active_territory_jobs(territory_id)
+            if len(active) >= limit:
+                # the job waits for a finished or failed one, so it keeps its place in the territory jobs order
+                logger.info(f"territory {territory_id} has {len(active)} active jobs, job is deferred")
+                dependencies.setdefault(active[-limit].id, active[-limit])
+            if dependencies:
+                # failures are allowed to let the territory jobs go on, required jobs are checked by DependentJob
+                kwargs["depends_on"] = Dependency(jobs=list(dependencies.values()), allow_failure=True)
+
+            job, enqueued = enqueue_unique(queue, key, func, *args, force=force, **kwargs)
+            if enqueued:
+                self.redis.zadd(territory_jobs_key, {job.id: time.time()})
+        return job, enqueued
+
+    def stats(self) -> list[QueueStats]:
+        """Returns: depth and wait times of every queue from the highest priority to the lowest one"""
+
+        current_time = now()
+        stats = []
+        for priority in self.config.priorities:
+            for name in self.config.priority_queue_names(priority):
+                queue = self.queues[name]
+                first_jobs = queue.get_jobs(0, 1)
+                oldest_wait = (
+                    (current_time - first_jobs[0].enqueued_at).total_seconds()
+                    if first_jobs and first_jobs[0].enqueued_at is not None
+                    else 0.0
+                )
+
+                started_registry = StartedJobRegistry(queue=queue)
+                started_jobs = [
+                    job
+                    for job in Job.fetch_many(started_registry.get_job_ids(), connection=self.redis)
+                    if job is not None and job.started_at is not None and job.enqueued_at is not None
+                ]
+                started_wait = (
+                    sum((job.started_at - job.enqueued_at).total_seconds() for job in started_jobs) / len(started_jobs)
+                    if started_jobs
+                    else 0.0
+                )
+
+                stats.append(
+                    QueueStats(
+                        name=name,
+                        priority=priority,
+                        queued=queue.count,
+                        started=len(started_registry),
+                        deferred=len(DeferredJobRegistry(queue=queue)),
+                        oldest_wait=oldest_wait,
+                        started_wait=started_wait,
+                    )
+                )
+        return stats
@@ -0,0 +1,53 @@
+"""
+JSON serialization used by http clients and api responses is defined here,
+orjson is used when it is installed, stdlib json otherwise
+"""
+
+from __future__ import annotations
+
+import json
+import typing as tp
+from datetime import date, datetime
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: tp.Any) -> tp.Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: tp.Any) -> bytes:
+    """Returns: compact utf-8 json of obj"""
+
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes | str) -> tp.Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`"""
+
+    def render(self, content: tp.Any) -> bytes:
+        return dumps(content)
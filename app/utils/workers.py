@@ -0,0 +1,101 @@
+"""
+rq workers supervisor is defined here
+"""
+
+from __future__ import annotations
+
+import signal
+import time
+
+import multiprocess as mp
+import structlog
+
+from .config import RedisQueueConfig
+from .redis_client import start_rq_worker
+
+
+logger = structlog.getLogger()
+
+
+class WorkerSupervisor:
+    """
+    Runs configured amount of rq worker processes listening to all job queues from the highest priority,
+    `reserved_workers` of them (but not all) listen only to the highest priority queues unless queues are given,
+    restarts the ones that crashed and drains them on stop:
+    first SIGTERM makes rq worker finish its current job (warm shutdown),
+    workers still alive after shutdown_timeout get the second one (cold shutdown) and then are killed
+    """
+
+    def __init__(self, config: RedisQueueConfig, workers: int | None = None, queue_names: list[str] | None = None):
+        self.config = config
+        self.workers = config.workers if workers is None else workers
+        if queue_names:
+            self.workers_queue_names = [queue_names] * self.workers
+        else:
+            reserved = max(min(config.reserved_workers, self.workers - 1), 0)
+            self.workers_queue_names = [config.priority_queue_names(config.priorities[0])] * reserved + [
+                config.queue_names
+            ] * (self.workers - reserved)
+        self._processes: list[mp.Process] = []
+        self._stopping = False
+
+    def _spawn(self, queue_names: list[str]) -> mp.Process:
+        process = mp.Process(
+            target=start_rq_worker,
+            args=(self.config.host, self.config.port, self.config.db, queue_names),
+        )
+        process.start()
+        logger.info(f"started rq worker, pid: {process.pid}, queues: {queue_names}")
+        return process
+
+    def start(self) -> None:
+        self._stopping = False
+        self._processes = [self._spawn(queue_names) for queue_names in self.workers_queue_names]
+
+    def check(self) -> None:
+        """Restarts workers which have exited while supervisor is running"""
+
+        if self._stopping:
+            return
+        for i, process in enumerate(self._processes):
+            if not process.is_alive():
+                logger.error(f"rq worker exited, pid: {process.pid}, exitcode: {process.exitcode}, restarting")
+                self._processes[i] = self._spawn(self.workers_queue_names[i])
+
+    def stop(self) -> None:
+        """Drains and stops all workers"""
+
+        self._stopping = True
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + self.config.shutdown_timeout
+        for process in self._processes:
+            process.join(max(deadline - time.monotonic(), 0))
+
+        for process in self._processes:
+            if process.is_alive():
+                logger.warning(f"rq worker {process.pid} didn't finish its job in time, forcing shutdown")
+                process.terminate()
+                process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self._processes = []
+        logger.info("all rq workers are stopped")
+
+    def run(self) -> None:
+        """Starts workers and supervises them until SIGINT/SIGTERM is received"""
+
+        def _request_stop(signum, frame):
+            self._stopping = True
+
+        signal.signal(signal.SIGINT, _request_stop)
+        signal.signal(signal.SIGTERM, _request_stop)
+
+        self.start()
+        while not self._stopping:
+            time.sleep(self.config.check_interval)
+            self.check()
+        self.stop()
@@ -0,0 +1,34 @@
+"""
+Standalone rq workers launcher is defined here, used to scale compute separately from api
+"""
+
+from __future__ import annotations
+
+import os
+
+import click
+
+from app.utils import PopulationRestoratorApiConfig, WorkerSupervisor, configure_logging, try_load_envfile
+
+
+@click.command()
+@click.option("--config", "config_path", envvar="CONFIG_PATH", default=None, help="path to the yaml config")
+@click.option("--workers", type=int, default=None, help="amount of worker processes, redis_queue.workers by default")
+@click.option(
+    "--queue",
+    "queue_names",
+    multiple=True,
+    help="queue to listen to, e.g. restore:bulk, could be used multiple times, higher priority first,"
+    " all configured job queues by default",
+)
+def main(config_path: str | None, workers: int | None, queue_names: tuple[str, ...]):
+    config = PopulationRestoratorApiConfig.from_file_or_default(config_path)
+    loggers_dict = {logger_config.filename: logger_config.level for logger_config in config.logging.files}
+    configure_logging(config.logging.level, loggers_dict)
+
+    WorkerSupervisor(config.redis_queue, workers=workers or None, queue_names=list(queue_names) or None).run()
+
+
+if __name__ == "__main__":
+    try_load_envfile(os.environ.get("ENVFILE", ".env"))
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of SavingClient create-many payloads serialization
+
+Serializes every `dtos` chunk of one synthetic forecast year (buildings x ages x sexes rows)
+with stdlib json (what aiohttp `json=` did) and with app.utils.serialization.dumps,
+which uses orjson when it is installed.
+
+Run: python -m benchmarks.serialization --buildings 20000 --chunk-size 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable
+
+import numpy as np
+
+from app.models import ForecastedDistribution
+from app.utils import serialization
+
+
+def make_year(buildings: int, ages: int = 101, seed: int = 0) -> ForecastedDistribution:
+    rng = np.random.default_rng(seed)
+    rows = buildings * ages
+    return ForecastedDistribution(
+        scenario="NEUTRAL",
+        year=2026,
+        building_id=np.repeat(np.arange(buildings), ages * 2),
+        sex=np.tile(np.array(["MALE", "FEMALE"], dtype=object), rows),
+        age=np.tile(np.repeat(np.arange(ages), 2), buildings),
+        value=rng.integers(0, 20, rows * 2),
+    )
+
+
+def serialize_year(distribution: ForecastedDistribution, chunk_size: int, dumps: Callable[[Any], bytes]) -> int:
+    size = 0
+    for start in range(0, len(distribution), chunk_size):
+        size += len(dumps({"dtos": distribution.dtos(start, start + chunk_size)}))
+    return size
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buildings", type=int, default=20_000, help="number of buildings in a year")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="dtos per create-many request")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    args = parser.parse_args()
+
+    distribution = make_year(args.buildings)
+    backend = "orjson" if serialization.orjson is not None else "stdlib json (orjson is not installed)"
+
+    dtos_time = measure(lambda: serialize_year(distribution, args.chunk_size, lambda obj: b""), args.repeat)
+    stdlib_time = measure(
+        lambda: serialize_year(distribution, args.chunk_size, lambda obj: json.dumps(obj).encode("utf-8")),
+        args.repeat,
+    )
+    fast_time = measure(lambda: serialize_year(distribution, args.chunk_size, serialization.dumps), args.repeat)
+    payload_size = serialize_year(distribution, args.chunk_size, serialization.dumps)
+
+    print(f"one year, {len(distribution)} rows, {args.chunk_size} rows per chunk, {payload_size / 2**20:.1f} MiB:")
+    print(f"  building dtos only: {dtos_time:.3f}s")
+    print(f"  stdlib json.dumps: {stdlib_time - dtos_time:.3f}s")
+    print(f"  serialization.dumps, {backend}: {fast_time - dtos_time:.3f}s")
+    print(f"  speedup: x{(stdlib_time - dtos_time) / max(fast_time - dtos_time, 1e-9):.1f}")
+
+
+if __name__ == "__main__":
+    main()
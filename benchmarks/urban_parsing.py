@@ -0,0 +1,127 @@
+"""
+Micro-benchmark of UrbanClient GeoJSON parsing
+
+Compares per-feature `df.loc[id] = {...}` formatting that UrbanClient used before
+with column parsers from app.http_clients.models.urban_client.parsers on a synthetic payload.
+
+Run: python -m benchmarks.urban_parsing --features 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Callable
+
+import pandas as pd
+
+from app.http_clients.models.urban_client.parsers import houses_from_features, territories_from_features
+
+
+def make_houses_features(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [rng.uniform(29, 31), rng.uniform(59, 61)]},
+            "properties": {
+                "building": {
+                    "id": house_id,
+                    "properties": {
+                        "living_area_modeled": rng.choice([None, rng.uniform(50, 5000)]),
+                        "living_area_official": rng.choice([None, rng.uniform(50, 5000)]),
+                    },
+                },
+                "territories": [{"id": rng.randint(1, 500)}],
+            },
+        }
+        for house_id in range(count)
+    ]
+
+
+def make_territories_features(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [rng.uniform(29, 31), rng.uniform(59, 61)]},
+            "properties": {
+                "territory_id": territory_id,
+                "name": f"territory {territory_id}",
+                "parent": {"id": rng.randint(1, 50)},
+                "level": rng.randint(2, 6),
+            },
+        }
+        for territory_id in range(count)
+    ]
+
+
+def legacy_houses(features: list[dict[str, Any]]) -> pd.DataFrame:
+    houses_df = pd.DataFrame(columns=["house_id", "territory_id", "living_area"])
+    houses_df.set_index("house_id", drop=False, inplace=True)
+    for i in features:
+        living_area_modeled = i["properties"]["building"]["properties"]["living_area_modeled"]
+        living_area_official = i["properties"]["building"]["properties"]["living_area_official"]
+        houses_df.loc[i["properties"]["building"]["id"]] = {
+            "house_id": i["properties"]["building"]["id"],
+            "territory_id": i["properties"]["territories"][0]["id"],
+            "living_area": living_area_modeled if living_area_modeled is not None else (living_area_official or 0),
+        }
+    return houses_df
+
+
+def legacy_territories(features: list[dict[str, Any]]) -> pd.DataFrame:
+    territories_df = pd.DataFrame(columns=["territory_id", "name", "parent_id", "level", "geometry"])
+    territories_df.set_index("territory_id", inplace=True)
+    for i in features:
+        territories_df.loc[i["properties"]["territory_id"]] = {
+            "name": i["properties"]["name"],
+            "parent_id": i["properties"]["parent"]["id"],
+            "level": i["properties"]["level"],
+            "geometry": i["geometry"],
+        }
+    return territories_df
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--features", type=int, default=100_000, help="number of synthetic features")
+    parser.add_argument(
+        "--legacy-features",
+        type=int,
+        default=5_000,
+        help="number of features for the legacy formatting and the reported speedup, it is very slow on big payloads",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs for column parsers")
+    args = parser.parse_args()
+
+    legacy_count = min(args.legacy_features, args.features)
+
+    for name, make_features, legacy, columnar in (
+        ("houses", make_houses_features, legacy_houses, lambda f: houses_from_features(f, 0)),
+        ("territories", make_territories_features, legacy_territories, territories_from_features),
+    ):
+        features = make_features(args.features)
+        columnar_time = measure(lambda: columnar(features), args.repeat)
+        legacy_time = measure(lambda: legacy(features[:legacy_count]), 1)
+        columnar_subset_time = measure(lambda: columnar(features[:legacy_count]), args.repeat)
+
+        print(f"{name}:")
+        print(f"  columns parsing, {args.features} features: {columnar_time:.3f}s")
+        print(f"  legacy .loc formatting, {legacy_count} features: {legacy_time:.3f}s")
+        print(f"  columns parsing, {legacy_count} features: {columnar_subset_time:.3f}s")
+        print(f"  speedup on {legacy_count} features: x{legacy_time / columnar_subset_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Forecast checkpoint, upload manifest and deletion of previous forecasts by manifest ids are tested here"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.logic import TerritoriesService
+from app.logic.checkpoint import ForecastCheckpoint, divided_db_version
+from app.logic.upload_manifest import UploadManifest
+from app.models import FertilityInterval
+from app.utils.config import PopulationRestoratorConfig, WorkingDirConfig
+
+
+TERRITORY_ID = 1
+YEAR_BEGIN = 2020
+SCENARIO = "NEUTRAL"
+
+
+def make_year_db(path: Path, year: int, house_ids: list[int]) -> str:
+    """Creates forecast output db with population of the year in the given houses"""
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE houses_tmp (id INTEGER PRIMARY KEY, capacity INTEGER)")
+        conn.execute("CREATE TABLE social_groups_probabilities (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE social_groups_distribution (social_group_id INTEGER, age INTEGER)")
+        conn.execute("CREATE TABLE population_divided (year INTEGER, house_id INTEGER, age INTEGER, men INTEGER)")
+        conn.executemany(
+            "INSERT INTO population_divided VALUES (?, ?, 0, 1)", [(year, house_id) for house_id in house_ids]
+        )
+    conn.close()
+    return str(path)
+
+
+def db_paths(directory: Path, years: int = 3) -> dict[int, str]:
+    return TerritoriesService.get_forecast_db_paths(str(directory), TERRITORY_ID, YEAR_BEGIN, years, SCENARIO)
+
+
+def upload_year(checkpoint: ForecastCheckpoint, job_dir: Path, year: int, house_ids: list[int]) -> None:
+    db_path = make_year_db(job_dir / Path(db_paths(job_dir)[year]).name, year, house_ids)
+    checkpoint.begin_year(year, set(house_ids))
+    checkpoint.commit_year(year, db_path)
+
+
+@pytest.fixture(name="dirs")
+def fixture_dirs(tmp_path: Path) -> tuple[Path, Path]:
+    published, job_dir = tmp_path / "published", tmp_path / "job"
+    published.mkdir()
+    job_dir.mkdir()
+    return published, job_dir
+
+
+def test_divided_db_version_is_kept_by_hard_links(tmp_path: Path):
+    divided = tmp_path / "divided.sqlite"
+    divided.write_bytes(b"divided")
+    os.link(divided, tmp_path / "linked.sqlite")
+
+    assert divided_db_version(str(tmp_path / "linked.sqlite")) == divided_db_version(str(divided))
+
+    version = divided_db_version(str(divided))
+    divided.unlink()
+    divided.write_bytes(b"divided again")
+    assert divided_db_version(str(divided)) != version
+
+
+def test_completed_years_stop_at_first_not_completed_year(dirs: tuple[Path, Path]):
+    published, job_dir = dirs
+    checkpoint = ForecastCheckpoint(str(published), YEAR_BEGIN)
+    checkpoint.start("v1")
+
+    upload_year(checkpoint, job_dir, 2021, [1, 2])
+    upload_year(checkpoint, job_dir, 2022, [1, 2])
+    # ids of the year are added, but the year is not uploaded
+    checkpoint.begin_year(2023, {1, 2})
+
+    assert checkpoint.completed_years(db_paths(published), "v1") == [2021, 2022]
+    assert checkpoint.completed_years(db_paths(published), None) == []
+
+    Path(db_paths(published)[2022]).unlink()
+    assert checkpoint.completed_years(db_paths(published), "v1") == [2021]
+
+
+def test_another_divided_db_invalidates_checkpoint(dirs: tuple[Path, Path]):
+    published, job_dir = dirs
+    checkpoint = ForecastCheckpoint(str(published), YEAR_BEGIN)
+    checkpoint.start("v1")
+    upload_year(checkpoint, job_dir, 2021, [1, 2])
+
+    assert checkpoint.completed_years(db_paths(published), "v2") == []
+    assert ForecastCheckpoint(str(published), YEAR_BEGIN - 1).completed_years(db_paths(published), "v1") == []
+
+    checkpoint.start("v2")
+    assert checkpoint.completed_years(db_paths(published), "v1") == []
+    # uploaded ids of the previous forecast are kept to be deleted
+    assert checkpoint.manifest.load() == {2021: {1, 2}}
+    assert checkpoint.manifest.completed_years() == set()
+
+
+def test_db_without_forecast_tables_is_not_resumed(dirs: tuple[Path, Path]):
+    published, job_dir = dirs
+    checkpoint = ForecastCheckpoint(str(published), YEAR_BEGIN)
+    checkpoint.start("v1")
+    upload_year(checkpoint, job_dir, 2021, [1])
+    upload_year(checkpoint, job_dir, 2022, [1])
+
+    with sqlite3.connect(db_paths(published)[2022]) as conn:
+        conn.execute("DROP TABLE houses_tmp")
+    conn.close()
+    assert checkpoint.completed_years(db_paths(published), "v1") == []
+
+
+def test_lock_waits_for_another_job(tmp_path: Path):
+    first = ForecastCheckpoint(str(tmp_path), YEAR_BEGIN)
+    second = ForecastCheckpoint(str(tmp_path), YEAR_BEGIN)
+    first.lock()
+
+    locked = threading.Event()
+
+    def lock_second():
+        second.lock()
+        locked.set()
+
+    thread = threading.Thread(target=lock_second)
+    thread.start()
+    try:
+        assert not locked.wait(0.2)
+    finally:
+        first.unlock()
+        thread.join(5)
+    assert locked.is_set()
+    second.unlock()
+
+
+def test_legacy_manifest_years_are_completed(tmp_path: Path):
+    (tmp_path / UploadManifest.filename).write_text('{"2021": [1, 2], "2022": [3]}', encoding="utf-8")
+    manifest = UploadManifest(str(tmp_path))
+
+    assert manifest.load() == {2021: {1, 2}, 2022: {3}}
+    assert manifest.completed_years() == {2021, 2022}
+    assert manifest.meta == {}
+
+
+class FakeSavingClient:
+    def __init__(self):
+        self.deleted: list[tuple[str, dict[int, set[int]]]] = []
+
+    async def delete_forecasted_data(self, scenario: str, buildings_ids: dict[int, set[int]]) -> None:
+        self.deleted.append((scenario, buildings_ids))
+
+
+def test_previous_forecast_is_deleted_by_manifest_ids(dirs: tuple[Path, Path]):
+    published, job_dir = dirs
+    checkpoint = ForecastCheckpoint(str(published), YEAR_BEGIN)
+    checkpoint.start("v1")
+    upload_year(checkpoint, job_dir, 2021, [1, 2])
+    upload_year(checkpoint, job_dir, 2022, [1, 2])
+    # partially uploaded year, its db is never published
+    checkpoint.begin_year(2023, {3, 4})
+    # output db may have less houses than were uploaded, manifest ids are used for deletion
+    make_year_db(Path(db_paths(published)[2022]).with_suffix(".tmp"), 2022, [1])
+    os.replace(Path(db_paths(published)[2022]).with_suffix(".tmp"), db_paths(published)[2022])
+
+    saving_client = FakeSavingClient()
+    service = TerritoriesService(
+        urban_client=None,
+        socdemo_client=None,
+        saving_client=saving_client,
+        population_restorator_config=PopulationRestoratorConfig(
+            working_dirs=WorkingDirConfig(str(published), str(published)),
+            fertility_interval=FertilityInterval(start=18, end=40),
+        ),
+        result_store=None,
+        debug=False,
+    )
+    asyncio.run(
+        service.delete_previous_forecasted_data(
+            str(published), TERRITORY_ID, YEAR_BEGIN, 3, SCENARIO, keep_years={2021}
+        )
+    )
+
+    assert saving_client.deleted == [(SCENARIO, {2022: {1, 2}, 2023: {3, 4}})]
+    assert Path(db_paths(published)[2021]).exists()
+    assert not Path(db_paths(published)[2022]).exists()
+    assert checkpoint.manifest.load() == {2021: {1, 2}}
@@ -0,0 +1,102 @@
+"""Circuit breaker half-open state handling by handle_exceptions is tested here"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.http_clients.common import (
+    CircuitBreaker,
+    CircuitOpenError,
+    InvalidStatusCode,
+    ObjectNotFoundError,
+    handle_exceptions,
+)
+from app.utils import ApiConfig, CircuitBreakerConfig, RetryConfig
+
+
+RESET_TIMEOUT = 0.05
+
+
+class FakeClient:
+    """Client which answers calls with the given errors or results in order"""
+
+    def __init__(self, *answers):
+        self.config = ApiConfig(
+            host="http://upstream",
+            port=80,
+            api_key=None,
+            retry=RetryConfig(attempts=1),
+            circuit_breaker=CircuitBreakerConfig(failure_threshold=2, reset_timeout=RESET_TIMEOUT),
+        )
+        self.circuit_breaker = CircuitBreaker(str(self), self.config.circuit_breaker)
+        self.answers = list(answers)
+
+    def __str__(self):
+        return "FakeClient"
+
+    @handle_exceptions
+    async def call(self):
+        answer = self.answers.pop(0)
+        if isinstance(answer, BaseException):
+            raise answer
+        return answer
+
+
+def open_circuit(client: FakeClient) -> None:
+    for _ in range(2):
+        with pytest.raises(InvalidStatusCode):
+            asyncio.run(client.call())
+    assert client.circuit_breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.call())
+    time.sleep(RESET_TIMEOUT * 2)
+
+
+@pytest.mark.parametrize(
+    "trial_error",
+    [ObjectNotFoundError("Got 404"), InvalidStatusCode("Unexpected status code", 422)],
+)
+def test_trial_answered_with_client_error_closes_circuit(trial_error: Exception):
+    client = FakeClient(InvalidStatusCode("", 503), InvalidStatusCode("", 503), trial_error, "ok")
+    open_circuit(client)
+
+    with pytest.raises(type(trial_error)):
+        asyncio.run(client.call())
+
+    assert not client.circuit_breaker.is_open
+    assert asyncio.run(client.call()) == "ok"
+
+
+def test_cancelled_trial_lets_next_trial_through():
+    client = FakeClient(InvalidStatusCode("", 503), InvalidStatusCode("", 503), asyncio.CancelledError(), "ok")
+    open_circuit(client)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(client.call())
+
+    assert client.circuit_breaker.is_open
+    assert asyncio.run(client.call()) == "ok"
+    assert not client.circuit_breaker.is_open
+
+
+def test_failed_trial_opens_circuit_again():
+    client = FakeClient(InvalidStatusCode("", 503), InvalidStatusCode("", 503), InvalidStatusCode("", 503))
+    open_circuit(client)
+
+    with pytest.raises(InvalidStatusCode):
+        asyncio.run(client.call())
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.call())
+
+
+def test_open_circuit_error_tells_when_to_retry():
+    client = FakeClient(InvalidStatusCode("", 503), InvalidStatusCode("", 503))
+    for _ in range(2):
+        with pytest.raises(InvalidStatusCode):
+            asyncio.run(client.call())
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        asyncio.run(client.call())
+    assert 0 < exc_info.value.retry_after <= RESET_TIMEOUT
@@ -0,0 +1,147 @@
+"""Territory jobs limit, job dependencies and coalescing of identical jobs of JobScheduler are tested on fakeredis"""
+
+import fakeredis
+import pytest
+from rq import Queue, SimpleWorker
+from rq.job import JobStatus
+
+from app.utils import DependentJob, JobScheduler, RedisQueueConfig, is_job_active, job_key
+from app.utils.redis_client import job_exception_handler
+
+
+TERRITORY_ID = 1
+
+
+def succeed(*args, **kwargs) -> str:
+    return "done"
+
+
+def fail(*args, **kwargs) -> None:
+    raise RuntimeError("job failed")
+
+
+@pytest.fixture(name="scheduler")
+def fixture_scheduler() -> JobScheduler:
+    redis_conn = fakeredis.FakeRedis()
+    config = RedisQueueConfig(host="localhost", port="6379", db=0, queue_name="default", territory_jobs_limit=2)
+    queues = {name: Queue(name, connection=redis_conn) for name in config.queue_names}
+    return JobScheduler(redis_conn, queues, config)
+
+
+def run_jobs(scheduler: JobScheduler) -> None:
+    worker = SimpleWorker(
+        list(scheduler.queues.values()),
+        connection=scheduler.redis,
+        job_class=DependentJob,
+        exception_handlers=[job_exception_handler],
+    )
+    worker.work(burst=True)
+
+
+def test_job_over_territory_limit_is_deferred(scheduler: JobScheduler):
+    first, _ = scheduler.enqueue("restore", "restore-1", succeed, territory_id=TERRITORY_ID)
+    second, _ = scheduler.enqueue("restore", "restore-2", succeed, territory_id=TERRITORY_ID)
+    third, _ = scheduler.enqueue("restore", "restore-3", succeed, territory_id=TERRITORY_ID)
+    other_territory, _ = scheduler.enqueue("restore", "restore-4", succeed, territory_id=TERRITORY_ID + 1)
+
+    assert first.get_status() == second.get_status() == JobStatus.QUEUED
+    assert third.get_status() == JobStatus.DEFERRED
+    assert third.dependency_ids == [first.id]
+    assert other_territory.get_status() == JobStatus.QUEUED
+
+    run_jobs(scheduler)
+    assert [job.get_status() for job in (first, second, third)] == [JobStatus.FINISHED] * 3
+    assert scheduler.active_territory_jobs(TERRITORY_ID) == []
+
+
+def test_failed_job_releases_territory_jobs_waiting_for_it(scheduler: JobScheduler):
+    failed, _ = scheduler.enqueue("restore", "restore-1", fail, territory_id=TERRITORY_ID)
+    scheduler.enqueue("restore", "restore-2", succeed, territory_id=TERRITORY_ID)
+    waiting, _ = scheduler.enqueue("restore", "restore-3", succeed, territory_id=TERRITORY_ID)
+    assert waiting.get_status() == JobStatus.DEFERRED
+
+    run_jobs(scheduler)
+    assert failed.get_status() == JobStatus.FAILED
+    assert waiting.get_status() == JobStatus.FINISHED
+    assert waiting.return_value() == "done"
+
+
+def test_job_requiring_failed_job_fails(scheduler: JobScheduler):
+    divide, _ = scheduler.enqueue("divide", "divide-1", fail, territory_id=TERRITORY_ID)
+    restore, _ = scheduler.enqueue("restore", "restore-1", succeed, territory_id=TERRITORY_ID, requires=[divide])
+    assert restore.get_status() == JobStatus.DEFERRED
+
+    run_jobs(scheduler)
+    assert restore.get_status() == JobStatus.FAILED
+    restore.refresh()
+    assert restore.meta["exc_type"]["exc_type"].__name__ == "DependencyFailedError"
+
+
+def test_dead_deferred_job_does_not_count_against_limit(scheduler: JobScheduler):
+    first, _ = scheduler.enqueue("restore", "restore-1", succeed, territory_id=TERRITORY_ID)
+    second, _ = scheduler.enqueue("restore", "restore-2", succeed, territory_id=TERRITORY_ID)
+    dead, _ = scheduler.enqueue("restore", "restore-3", succeed, territory_id=TERRITORY_ID)
+    # rq never runs dependents of canceled jobs
+    first.cancel()
+
+    assert dead.get_status() == JobStatus.DEFERRED
+    assert not is_job_active(dead)
+    assert [job.id for job in scheduler.active_territory_jobs(TERRITORY_ID)] == [second.id]
+
+    next_job, _ = scheduler.enqueue("restore", "restore-4", succeed, territory_id=TERRITORY_ID)
+    assert next_job.get_status() == JobStatus.QUEUED
+
+
+def test_depends_on_is_rejected(scheduler: JobScheduler):
+    job, _ = scheduler.enqueue("divide", "divide-1", succeed, territory_id=TERRITORY_ID)
+
+    with pytest.raises(TypeError):
+        scheduler.enqueue("restore", "restore-1", succeed, territory_id=TERRITORY_ID, depends_on=job)
+
+
+def test_job_key_does_not_depend_on_params_order():
+    assert job_key("restore", territory_id=1, scenario="NEUTRAL") == job_key(
+        "restore", scenario="NEUTRAL", territory_id=1
+    )
+    assert job_key("restore", territory_id=1, scenario="NEUTRAL") != job_key(
+        "restore", territory_id=2, scenario="NEUTRAL"
+    )
+    assert job_key("restore", territory_id=1) != job_key("divide", territory_id=1)
+
+
+def test_identical_jobs_are_coalesced(scheduler: JobScheduler):
+    key = job_key("restore", territory_id=TERRITORY_ID)
+    job, enqueued = scheduler.enqueue("restore", key, succeed, territory_id=TERRITORY_ID)
+    same_job, same_enqueued = scheduler.enqueue("restore", key, succeed, territory_id=TERRITORY_ID)
+    other_priority_job, other_priority_enqueued = scheduler.enqueue(
+        "restore", key, succeed, territory_id=TERRITORY_ID, priority="interactive"
+    )
+
+    assert enqueued and not same_enqueued and not other_priority_enqueued
+    assert same_job.id == other_priority_job.id == job.id
+    assert len(scheduler.active_territory_jobs(TERRITORY_ID)) == 1
+
+
+def test_forced_job_is_not_coalesced(scheduler: JobScheduler):
+    key = job_key("restore", territory_id=TERRITORY_ID)
+    job, _ = scheduler.enqueue("restore", key, succeed, territory_id=TERRITORY_ID)
+    forced, enqueued = scheduler.enqueue("restore", key, succeed, territory_id=TERRITORY_ID, force=True)
+
+    assert enqueued
+    assert forced.id != job.id
+    # the key points to the last job
+    assert scheduler.enqueue("restore", key, succeed, territory_id=TERRITORY_ID)[0].id == forced.id
+
+
+@pytest.mark.parametrize("func", [succeed, fail])
+def test_finished_job_is_not_reused(scheduler: JobScheduler, func):
+    key = job_key("restore", territory_id=TERRITORY_ID)
+    job, _ = scheduler.enqueue("restore", key, func, territory_id=TERRITORY_ID)
+    run_jobs(scheduler)
+    assert job.get_status() in (JobStatus.FINISHED, JobStatus.FAILED)
+
+    next_job, enqueued = scheduler.enqueue("restore", key, succeed, territory_id=TERRITORY_ID)
+    assert enqueued
+    assert next_job.id != job.id
+    # results of the previous job are kept
+    assert job.get_status() in (JobStatus.FINISHED, JobStatus.FAILED)